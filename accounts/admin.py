@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 from .models import PlayerProfile, Achievement, Notification
+from .services import recount_unread
 
 # Определим инлайн для профиля, чтобы он отображался на странице пользователя
 class PlayerProfileInline(admin.StackedInline):
@@ -34,7 +35,9 @@ class NotificationAdmin(admin.ModelAdmin):
 
     def mark_as_read(self, request, queryset):
         """Действие администратора: пометить выбранные уведомления как прочитанные."""
+        recipient_ids = set(queryset.values_list('recipient_id', flat=True))
         updated_count = queryset.update(is_read=True)
+        recount_unread(recipient_ids) # Счетчики непрочитанных у затронутых игроков
         self.message_user(request, f"{updated_count} уведомлений помечены как прочитанные.")
     mark_as_read.short_description = "Пометить выбранные как прочитанные"
 
@@ -0,0 +1,17 @@
+# accounts/management/commands/recount_unread_notifications.py (новый файл)
+"""
+Пересчитывает счетчики непрочитанных уведомлений (PlayerProfile.unread_notifications)
+по таблице уведомлений. Нужна один раз после появления счетчика и после
+массовых изменений уведомлений в обход accounts.services.
+
+    python manage.py recount_unread_notifications
+"""
+from django.core.management.base import BaseCommand
+from accounts.services import recount_unread
+
+class Command(BaseCommand):
+    help = "Пересчитывает счетчики непрочитанных уведомлений всех игроков"
+
+    def handle(self, *args, **options):
+        total = recount_unread()
+        self.stdout.write(self.style.SUCCESS(f"Пересчитаны счетчики непрочитанных: {total}"))
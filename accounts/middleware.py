@@ -0,0 +1,15 @@
+# accounts/middleware.py (новый файл)
+from .services import buffered_notifications
+
+class NotificationBufferMiddleware:
+    """
+    Копит уведомления, созданные за время запроса, и записывает их одной пачкой.
+    Подключается в settings.MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with buffered_notifications():
+            return self.get_response(request)
@@ -2,6 +2,9 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
 class PlayerProfile(models.Model):
     """
@@ -17,6 +20,9 @@ class PlayerProfile(models.Model):
     total_heroes = models.PositiveIntegerField(default=1, verbose_name="Всего героев")
     games_played = models.PositiveIntegerField(default=0, verbose_name="Игр сыграно")
     
+    # Счетчик непрочитанных уведомлений (обновляется атомарно, см. accounts.services)
+    unread_notifications = models.PositiveIntegerField(default=0, verbose_name="Непрочитанных уведомлений")
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -77,8 +83,14 @@ class Notification(models.Model):
     def mark_as_read(self):
         """Помечает уведомление как прочитанное."""
         if not self.is_read:
+            updated = Notification.objects.filter(pk=self.pk, is_read=False).update(
+                is_read=True, updated_at=timezone.now()
+            )
             self.is_read = True
-            self.save()
+            if updated:
+                PlayerProfile.objects.filter(user_id=self.recipient_id).update(
+                    unread_notifications=Greatest(F('unread_notifications') - 1, 0)
+                )
 
 # Сигналы Django для автоматического создания профиля при регистрации пользователя
 from django.db.models.signals import post_save
@@ -90,6 +102,12 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created:
         PlayerProfile.objects.create(user=instance)
 
+@receiver(post_save, sender=PlayerProfile)
+def sync_premium_status(sender, instance, **kwargs):
+    # Ограничитель частоты действий (heroes.ratelimit) читает премиум статус из Redis
+    from heroes.ratelimit import set_premium
+    set_premium(instance.user_id, instance.premium_status)
+
 # Этот сигнал может вызвать проблемы при массовых операциях, 
 # лучше использовать try/except в коде, где это нужно.
 # @receiver(post_save, sender=User)
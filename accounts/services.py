@@ -1,23 +1,133 @@
 # accounts/services.py (новый файл)
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from django.contrib.auth.models import User
-from .models import Notification
+from django.conf import settings # Для настроек (например, размер пачки уведомлений)
+from django.db import transaction
+from django.db.models import F, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import Notification, PlayerProfile
 from heroes.models import Hero # Для ссылок на героя
 # from django.urls import reverse # Для генерации ссылок
-# from django.conf import settings # Для настроек (например, email)
+
+# Максимальный размер пачки при массовой вставке уведомлений
+NOTIFICATION_BULK_BATCH_SIZE = getattr(settings, 'NOTIFICATION_BULK_BATCH_SIZE', 1000)
+
+# Буфер, активный в текущем тике или запросе (см. buffered_notifications)
+_active_buffer = ContextVar('notification_buffer', default=None)
+
+class NotificationBuffer:
+    """
+    Копит уведомления и записывает их одним bulk_create.
+    """
+
+    def __init__(self, max_batch_size=None):
+        self.max_batch_size = max_batch_size or NOTIFICATION_BULK_BATCH_SIZE
+        self.pending = []
+
+    def add(self, notification: Notification):
+        self.pending.append(notification)
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные уведомления."""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        with transaction.atomic():
+            Notification.objects.bulk_create(pending, batch_size=self.max_batch_size)
+            _increment_unread(Counter(notification.recipient_id for notification in pending))
+
+@contextmanager
+def buffered_notifications(max_batch_size=None):
+    """
+    Внутри блока send_notification не пишет в БД сразу, а копит уведомления;
+    при выходе из блока они записываются пачкой. Вложенные блоки используют внешний буфер.
+    """
+    buffer = _active_buffer.get()
+    if buffer is not None:
+        yield buffer
+        return
+    buffer = NotificationBuffer(max_batch_size)
+    token = _active_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _active_buffer.reset(token)
+    buffer.flush()
+
+def _increment_unread(counts):
+    """
+    Увеличивает счетчики непрочитанных: {id пользователя: сколько добавить}.
+    Один UPDATE на каждое различное значение прироста.
+    """
+    users_by_count = defaultdict(list)
+    for user_id, count in counts.items():
+        users_by_count[count].append(user_id)
+    for count, user_ids in users_by_count.items():
+        PlayerProfile.objects.filter(user_id__in=user_ids).update(
+            unread_notifications=F('unread_notifications') + count
+        )
+
+def _deliver(notification: Notification):
+    """Записывает уведомление сразу или кладет его в активный буфер."""
+    buffer = _active_buffer.get()
+    if buffer is None:
+        with transaction.atomic():
+            notification.save()
+            _increment_unread({notification.recipient_id: 1})
+    else:
+        buffer.add(notification)
+    return notification
+
+def mark_notifications_read(user: User, notification_ids=None):
+    """
+    Помечает прочитанными все уведомления пользователя или только notification_ids
+    (например, текущую страницу) одним UPDATE и уменьшает счетчик.
+    Возвращает количество помеченных уведомлений.
+    """
+    unread = Notification.objects.filter(recipient=user, is_read=False)
+    if notification_ids is not None:
+        unread = unread.filter(pk__in=notification_ids)
+    with transaction.atomic():
+        updated = unread.update(is_read=True, updated_at=timezone.now())
+        if updated:
+            PlayerProfile.objects.filter(user=user).update(
+                unread_notifications=Greatest(F('unread_notifications') - updated, 0)
+            )
+    return updated
+
+def recount_unread(user_ids=None):
+    """
+    Пересчитывает счетчики непрочитанных по таблице уведомлений одним UPDATE
+    (у игроков user_ids или, если они не переданы, у всех).
+    Для массовых операций в обход сервисов (например, в админке).
+    Возвращает число обновленных профилей.
+    """
+    unread_count = Notification.objects.filter(
+        recipient_id=OuterRef('user_id'), is_read=False
+    ).values('recipient_id').annotate(count=Count('pk')).values('count')
+    profiles = PlayerProfile.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    return profiles.update(unread_notifications=Coalesce(Subquery(unread_count), 0))
 
 def send_notification(user: User, title: str, message: str, notification_type='info', link=None):
     """
     Отправляет уведомление пользователю.
     """
     # TODO: Добавить отправку email или push-уведомлений в будущем
-    notification = Notification.objects.create(
+    notification = Notification(
         recipient=user,
         title=title,
         message=message,
         notification_type=notification_type,
         link=link
     )
-    return notification
+    return _deliver(notification)
 
 def send_hero_notification(hero: Hero, title: str, message: str, notification_type='info'):
     """
@@ -28,12 +138,14 @@ def send_hero_notification(hero: Hero, title: str, message: str, notification_ty
     # link = reverse('heroes:detail') # Простая ссылка на героя
     # Для более точной ссылки на конкретого героя потребуются дополнительные настройки URL
     link = '/heroes/' # Пока так
-    return send_notification(
-        user=hero.owner,
+    # recipient_id вместо hero.owner - не загружаем пользователя ради уведомления
+    notification = Notification(
+        recipient_id=hero.owner_id,
         title=title,
         message=message,
         notification_type=notification_type,
         link=link
     )
+    return _deliver(notification)
 
 # ... (можно добавить другие специфичные функции, например, send_quest_completed_notification)
@@ -13,6 +13,7 @@ urlpatterns = [
     # Маршруты для уведомлений
     path('notifications/', views.notifications_list, name='notifications_list'),
     path('notifications/mark-read/<int:notification_id>/', views.mark_notification_read, name='mark_notification_read'),
+    path('notifications/mark-read/', views.mark_notifications_read_bulk, name='mark_notifications_read_bulk'),
     # path('password-reset/', auth_views.PasswordResetView.as_view(), name='password_reset'),
     # path('password-reset/done/', auth_views.PasswordResetDoneView.as_view(), name='password_reset_done'),
     # path('reset/<uidb64>/<token>/', auth_views.PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
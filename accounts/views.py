@@ -4,9 +4,15 @@ from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
 from .forms import CustomUserCreationForm, ProfileUpdateForm
 from .models import PlayerProfile, Notification # Добавлен импорт Notification
+from .services import mark_notifications_read
 from heroes.models import Hero
+from heroes.snapshots import get_hero_or_404
+from heroes.leaderboards import hero_ranks
 
 def register(request):
     if request.method == 'POST':
@@ -30,12 +36,13 @@ def register(request):
 def profile(request, username):
     user = get_object_or_404(User, username=username)
     profile = get_object_or_404(PlayerProfile, user=user)
-    # Получаем героя пользователя
-    hero = get_object_or_404(Hero, owner=user)
+    # Получаем героя пользователя (из кэша снимков)
+    hero = get_hero_or_404(user.id)
     context = {
         'profile_user': user,
         'profile': profile,
         'hero': hero,
+        'hero_ranks': hero_ranks(hero.pk), # Места в рейтингах (из Redis)
     }
     return render(request, 'accounts/profile.html', context)
 
@@ -64,18 +71,37 @@ def notifications_list(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Помечаем непрочитанные уведомления как прочитанные при просмотре списка
-    unread_notifications = user_notifications.filter(is_read=False)
-    for notif in unread_notifications:
-        notif.mark_as_read()
+    # Помечаем непрочитанные уведомления как прочитанные при просмотре списка (одним UPDATE)
+    mark_notifications_read(request.user)
     
     return render(request, 'accounts/notifications_list.html', {'page_obj': page_obj})
 
+def _redirect_next(request, next_url):
+    """Перенаправляет на next_url, если он ведет на этот же сайт, иначе на список уведомлений."""
+    if next_url and url_has_allowed_host_and_scheme(
+        next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        return redirect(next_url)
+    return redirect('accounts:notifications_list')
+
+@login_required
+@require_POST
+def mark_notifications_read_bulk(request):
+    """
+    Помечает прочитанными уведомления из списка ids (например, страницу)
+    или все уведомления пользователя, если ids не переданы.
+    """
+    raw_ids = request.POST.getlist('ids')
+    # Нечисловые id пропускаем; если переданы только такие, ничего не помечаем
+    notification_ids = [int(value) for value in raw_ids if value.isdigit()] if raw_ids else None
+    updated_count = mark_notifications_read(request.user, notification_ids)
+    messages.info(request, f"{updated_count} уведомлений помечены как прочитанные.")
+    return _redirect_next(request, request.POST.get('next'))
+
 @login_required
 def mark_notification_read(request, notification_id):
     """Помечает конкретное уведомление как прочитанное."""
     notification = get_object_or_404(Notification, id=notification_id, recipient=request.user)
     notification.mark_as_read()
     # Перенаправляем обратно на список или по ссылке из уведомления
-    next_url = request.GET.get('next', 'accounts:notifications_list')
-    return redirect(next_url)
+    return _redirect_next(request, request.GET.get('next'))
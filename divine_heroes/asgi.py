@@ -0,0 +1,11 @@
+# divine_heroes/asgi.py (новый файл)
+"""
+ASGI точка входа. Нужна для потока обновлений героя (Server-Sent Events),
+например: uvicorn divine_heroes.asgi:application
+"""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'divine_heroes.settings')
+
+application = get_asgi_application()
@@ -0,0 +1,119 @@
+# divine_heroes/leaderboards.py (новый файл)
+"""
+Рейтинги на сортированных множествах Redis (ZSET).
+Общий модуль проекта: на нем построены рейтинги героев (heroes.leaderboards)
+и гильдий (guilds.leaderboards).
+Обновление, место участника и страница топа - O(log n) без запросов к БД;
+полная пересборка пишет новое множество во временный ключ и подменяет
+старое одной командой RENAME.
+"""
+from django_redis import get_redis_connection
+
+# Сколько участников пишется одной командой ZADD при пересборке
+LEADERBOARD_REBUILD_BATCH = 1000
+
+
+def composite_score(major, minor, base=2 ** 32):
+    """
+    Счет из двух частей для сортировки по major, затем по minor
+    (например, уровень и опыт). minor должен быть меньше base.
+    """
+    return major * base + minor
+
+
+class RedisLeaderboard:
+    """
+    Рейтинг: участник (id) -> счет, по убыванию счета.
+    Методы записи принимают pipe, чтобы обновлять несколько рейтингов за один обмен с Redis.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.key = f"leaderboard:{name}"
+
+    def _connection(self, pipe=None):
+        return pipe if pipe is not None else get_redis_connection("default")
+
+    def set_scores(self, scores, pipe=None):
+        """Записывает счета {участник: счет}."""
+        if scores:
+            self._connection(pipe).zadd(self.key, scores)
+
+    def increment(self, member, amount, pipe=None):
+        """Прибавляет amount к счету участника."""
+        self._connection(pipe).zincrby(self.key, amount, member)
+
+    def remove(self, *members, pipe=None):
+        if members:
+            self._connection(pipe).zrem(self.key, *members)
+
+    def top(self, count=10, offset=0):
+        """Страница топа: [(место, участник, счет)], места с 1."""
+        rows = get_redis_connection("default").zrevrange(self.key, offset, offset + count - 1, withscores=True)
+        return [(offset + index + 1, int(member), score) for index, (member, score) in enumerate(rows)]
+
+    def rank(self, member):
+        """Место участника (с 1) или None, если его нет в рейтинге."""
+        rank = get_redis_connection("default").zrevrank(self.key, member)
+        return None if rank is None else rank + 1
+
+    def around(self, member, radius=10):
+        """Участник и до radius соседей выше и ниже: [(место, участник, счет)]."""
+        rank = get_redis_connection("default").zrevrank(self.key, member)
+        if rank is None:
+            return []
+        start = max(0, rank - radius)
+        return self.top(rank + radius - start + 1, start)
+
+    def count(self):
+        return get_redis_connection("default").zcard(self.key)
+
+    def rebuild(self, scores):
+        """
+        Пересобирает рейтинг из итератора пар (участник, счет) - например,
+        из values_list().iterator() - и атомарно подменяет старый.
+        """
+        return rebuild_leaderboards({None: self}, ((member, {None: score}) for member, score in scores))
+
+
+def rebuild_leaderboards(leaderboards, rows):
+    """
+    Пересобирает несколько рейтингов за один проход по данным.
+    leaderboards - {имя: RedisLeaderboard}, rows - итератор пар
+    (участник, {имя: счет}). Каждый рейтинг собирается во временном ключе
+    и подменяет старый через RENAME. Возвращает число участников.
+    """
+    connection = get_redis_connection("default")
+    temp_keys = {name: f"{leaderboard.key}:rebuild" for name, leaderboard in leaderboards.items()}
+    connection.delete(*temp_keys.values())
+    total = 0
+    batch = {name: {} for name in leaderboards}
+    pending = 0
+
+    def write_batch():
+        pipe = connection.pipeline(transaction=False)
+        for name, scores in batch.items():
+            if scores:
+                pipe.zadd(temp_keys[name], scores)
+                scores.clear()
+        pipe.execute()
+
+    for member, scores in rows:
+        for name, score in scores.items():
+            batch[name][member] = score
+        total += 1
+        pending += 1
+        if pending >= LEADERBOARD_REBUILD_BATCH:
+            write_batch()
+            pending = 0
+    if pending:
+        write_batch()
+
+    pipe = connection.pipeline()
+    for name, leaderboard in leaderboards.items():
+        if total:
+            pipe.rename(temp_keys[name], leaderboard.key)
+        else:
+            pipe.delete(leaderboard.key)
+    pipe.execute()
+    return total
@@ -35,20 +35,109 @@ CACHES = {
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://127.0.0.1:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://127.0.0.1:6379/0')
 
+# Игровой движок
+# Сколько героев обрабатывается и записывается в БД за одну пачку тика
+HERO_TICK_CHUNK_SIZE = 500
+# Сколько героев обрабатывает один шард тика (подзадача Celery)
+HERO_TICK_SHARD_SIZE = 5000
+# Интервал между ходами героя (в секундах) в зависимости от состояния
+HERO_TURN_INTERVALS = {
+    'fight': 60,
+    'adventure': 600,
+    'quest': 600,
+    'rest': 900,
+}
+# Ленивый режим: тик обрабатывает только героев игроков, заходивших за последние
+# HERO_LAZY_ACTIVE_DAYS дней; остальные догоняют ходы при просмотре (не более
+# HERO_CATCH_UP_MAX_TURNS за раз) или задачей catch_up_idle_heroes
+HERO_LAZY_SIMULATION = False
+HERO_LAZY_ACTIVE_DAYS = 3
+HERO_CATCH_UP_MAX_TURNS = 144
+# Захват героев тиком: на сколько секунд захваченный герой исключается из
+# выборки других тиков (если обработка упала, он снова станет доступен)
+HERO_TURN_LEASE_SECONDS = 300
+
+# Уведомления из движка копятся и пишутся пачками не больше этого размера.
+# Чтобы копить уведомления и в веб-запросах, добавьте в MIDDLEWARE
+# 'accounts.middleware.NotificationBufferMiddleware'
+NOTIFICATION_BULK_BATCH_SIZE = 1000
+
+# Журнал героя в Redis: сколько последних записей хранить и сколько секунд
+HERO_JOURNAL_LENGTH = 20
+HERO_JOURNAL_TIMEOUT = 7 * 24 * 3600
+
+# Кэш снимков героев для страниц просмотра (heroes/snapshots.py), секунды
+HERO_SNAPSHOT_TIMEOUT = 3600
+# Как часто процесс сверяет эпоху снимков (меняется мировыми событиями), секунды
+HERO_SNAPSHOT_EPOCH_CHECK_SECONDS = 5
+
+# Метрики тика (game_engine/metrics.py): включены ли и сколько самых медленных героев
+# хранить в сводке. Сводка последнего тика - /engine/metrics/ (только персонал)
+ENGINE_METRICS_ENABLED = True
+ENGINE_METRICS_SLOWEST = 10
+
+# Обновления героя в реальном времени (SSE через divine_heroes/asgi.py,
+# запасной вариант - длинный опрос): таймаут опроса, интервал keepalive и время
+# жизни одного потока (потом браузер переподключается), секунды
+HERO_LONG_POLL_TIMEOUT = 25
+HERO_STREAM_KEEPALIVE = 15
+HERO_STREAM_LIFETIME = 300
+
+# Лимиты божественных вмешательств (heroes/ratelimit.py, ведро жетонов в Redis):
+# действие -> {'default'/'premium': (емкость ведра, жетонов в минуту)}
+HERO_ACTION_RATE_LIMITS = {
+    'lightning': {'default': (3, 1), 'premium': (10, 5)},
+    'speech': {'default': (5, 2), 'premium': (20, 10)},
+}
+
+# Мировые события (game_engine/world.py): сколько секунд действуют модификаторы
+# события (множитель опыта, шанс встретить монстра и т.п.), если не указано иное
+WORLD_EVENT_DURATION = 3600
+
+# Гильдии: опыта на уровень (нужно уровень * GUILD_LEVEL_EXPERIENCE).
+# Вклады участников копятся в Redis и раз в минуту переносятся в БД
+# (guilds/contributions.py, задача fold-guild-contributions)
+GUILD_LEVEL_EXPERIENCE = 1000
+
 # Celery Beat Schedule
 from celery.schedules import crontab
 
 CELERY_BEAT_SCHEDULE = {
-    # Обрабатываем всех героев каждые 10 минут
+    # Каждую минуту обрабатываем героев, чей ход наступил (см. HERO_TURN_INTERVALS)
     'process-all-heroes': {
         'task': 'game_engine.tasks.process_all_heroes',
-        'schedule': 600.0, # 600 секунд = 10 минут
+        'schedule': 60.0,
     },
     # Запускаем глобальные события каждый час
     'run-global-events': {
         'task': 'game_engine.tasks.run_global_events',
         'schedule': crontab(minute=0), # Каждый час в 0 минут
     },
+    # Догоняем ходы неактивных героев (используется в ленивом режиме)
+    'catch-up-idle-heroes': {
+        'task': 'game_engine.tasks.catch_up_idle_heroes',
+        'schedule': crontab(hour=4, minute=30), # Ежедневно в 4:30
+    },
+    # Каждую минуту переносим накопленные вклады в гильдии (guilds.contributions)
+    'fold-guild-contributions': {
+        'task': 'guilds.tasks.fold_guild_contributions',
+        'schedule': 60.0,
+    },
+    # Сверяем рейтинги гильдий в Redis с БД
+    'reconcile-guild-leaderboards': {
+        'task': 'guilds.tasks.reconcile_guild_leaderboards',
+        'schedule': crontab(hour=5, minute=0), # Ежедневно в 5:00
+    },
+    # Сверяем рейтинги героев в Redis с БД
+    'reconcile-hero-leaderboards': {
+        'task': 'heroes.tasks.reconcile_hero_leaderboards',
+        'schedule': crontab(hour=5, minute=15), # Ежедневно в 5:15
+    },
+    # Сверяем множество премиум игроков в Redis (лимиты вмешательств) с БД
+    'reconcile-premium-users': {
+        'task': 'heroes.tasks.reconcile_premium_users',
+        'schedule': crontab(minute=30), # Каждый час в 30 минут
+    },
     # Можно добавить ежедневные задачи, например, воскрешение героев
     # 'resurrect-heroes-daily': {
     #     'task': 'game_engine.tasks.resurrect_heroes', # Нужно реализовать
@@ -7,5 +7,6 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('heroes/', include('heroes.urls')),
     path('events/', include('events.urls')), # Добавлено
+    path('engine/', include('game_engine.urls')), # Метрики тика для персонала
     path('', include('heroes.urls')), # Главная страница - страница героя
 ]
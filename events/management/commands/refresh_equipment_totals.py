@@ -0,0 +1,36 @@
+# events/management/commands/refresh_equipment_totals.py (новый файл)
+"""
+Пересчитывает суммарные силу и защиту (Equipment.total_power/total_defense)
+у уже существующей экипировки. Нужна один раз после появления этих полей:
+дальше их поддерживают Equipment.save и сигналы предметов.
+
+    python manage.py refresh_equipment_totals
+"""
+from django.core.management.base import BaseCommand
+from events.models import Equipment
+
+class Command(BaseCommand):
+    help = "Пересчитывает суммарные бонусы экипировки героев"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Сколько строк обновлять за один запрос")
+
+    def handle(self, *args, batch_size, **options):
+        equipment = Equipment.objects.select_related('weapon', 'armor').order_by('pk')
+        batch = []
+        total = 0
+        for item in equipment.iterator(chunk_size=batch_size):
+            item.refresh_totals()
+            batch.append(item)
+            if len(batch) >= batch_size:
+                total += self._flush(batch)
+        total += self._flush(batch)
+        self.stdout.write(self.style.SUCCESS(f"Пересчитана экипировка: {total}"))
+
+    def _flush(self, batch):
+        """Сохраняет пачку одним bulk_update и очищает ее."""
+        count = len(batch)
+        if batch:
+            Equipment.objects.bulk_update(batch, ['total_power', 'total_defense'])
+            batch.clear()
+        return count
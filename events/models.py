@@ -1,6 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Least
 from django.contrib.auth.models import User
+from django.utils import timezone
 from heroes.models import Hero
+from heroes.realtime import capture, publish_change
 
 class Quest(models.Model):
     """
@@ -154,18 +158,39 @@ class Inventory(models.Model):
             return f"У {self.hero.name} нет {self.item.name} в инвентаре."
 
         if self.item.item_type == 'healing':
-            if self.hero.health >= self.hero.max_health:
-                return f"{self.hero.name} полностью здоров и не нуждается в лечении."
+            hero = self.hero
+            if hero.health >= hero.max_health:
+                return f"{hero.name} полностью здоров и не нуждается в лечении."
             
+            before = capture(hero)
             heal_amount = self.item.healing_amount
-            self.hero.health = min(self.hero.max_health, self.hero.health + heal_amount)
-            self.hero.save()
-            
+            # Предмет расходуется и герой лечится условными UPDATE без блокировок:
+            # параллельный тик или второй запрос не потеряют изменений
+            healed = False
+            with transaction.atomic():
+                consumed = Inventory.objects.filter(pk=self.pk, quantity__gt=0).update(
+                    quantity=F('quantity') - 1, updated_at=timezone.now()
+                )
+                if not consumed:
+                    return f"У {hero.name} нет {self.item.name} в инвентаре."
+                healed = hero.update_atomically(
+                    Q(health__lt=F('max_health')),
+                    health=Least(F('health') + heal_amount, F('max_health'), output_field=models.IntegerField()),
+                )
+                if healed:
+                    # Удаляем запись, если предметы закончились
+                    Inventory.objects.filter(pk=self.pk, quantity=0).delete()
+                else:
+                    # Герой успел вылечиться или погибнуть - предмет не тратим.
+                    # После set_rollback запросы в этом блоке запрещены
+                    transaction.set_rollback(True)
+            if not healed:
+                hero.refresh_from_db(fields=['health', 'max_health', 'state'])
+                if hero.state == 'dead':
+                    return f"{hero.name} мертв и не может лечиться."
+                return f"{hero.name} полностью здоров и не нуждается в лечении."
+            publish_change(hero, before)
             self.quantity -= 1
-            if self.quantity <= 0:
-                self.delete() # Удаляем запись, если предметы закончились
-            else:
-                self.save()
             
             return f"{self.hero.name} использует {self.item.name} и восстанавливает {heal_amount} здоровья. Здоровье: {self.hero.health}/{self.hero.max_health}."
         
@@ -186,6 +211,11 @@ class Equipment(models.Model):
     armor = models.ForeignKey(Item, on_delete=models.SET_NULL, null=True, blank=True, related_name='equipped_as_armor')
     # Можно добавить другие слоты: амулет, кольцо и т.д.
     
+    # Суммарные бонусы от надетых предметов (пересчитываются при сохранении),
+    # чтобы движку не нужно было загружать сами предметы
+    total_power = models.IntegerField(default=0, verbose_name="Сила от экипировки")
+    total_defense = models.IntegerField(default=0, verbose_name="Защита от экипировки")
+    
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -195,23 +225,32 @@ class Equipment(models.Model):
     def __str__(self):
         return f"Экипировка {self.hero.name}"
 
-    def get_total_power(self):
-        """Возвращает общую силу от экипировки."""
-        total = 0
+    def save(self, *args, **kwargs):
+        self.refresh_totals()
+        super().save(*args, **kwargs)
+
+    def refresh_totals(self):
+        """Пересчитывает суммарные силу и защиту по надетым предметам."""
+        total_power = 0
+        total_defense = 0
         if self.weapon:
-            total += self.weapon.power
+            total_power += self.weapon.power
         # if self.armor: # Если будет свойство power у брони
-        #     total += self.armor.power
-        return total
+        #     total_power += self.armor.power
+        # if self.weapon: # Если будет свойство defense у оружия
+        #     total_defense += self.weapon.defense
+        if self.armor:
+            total_defense += self.armor.defense
+        self.total_power = total_power
+        self.total_defense = total_defense
+
+    def get_total_power(self):
+        """Возвращает общую силу от экипировки."""
+        return self.total_power
 
     def get_total_defense(self):
         """Возвращает общую защиту от экипировки."""
-        total = 0
-        # if self.weapon: # Если будет свойство defense у оружия
-        #     total += self.weapon.defense
-        if self.armor:
-            total += self.armor.defense
-        return total
+        return self.total_defense
 
     def equip_item(self, item: Item):
         """
@@ -264,3 +303,43 @@ from django.dispatch import receiver
 def create_hero_equipment(sender, instance, created, **kwargs):
     if created:
         Equipment.objects.create(hero=instance)
+
+# Сигналы для сброса каталогов квестов и предметов в памяти воркеров (game_engine.catalog)
+from django.db.models.signals import post_delete
+
+@receiver(post_save, sender=Quest)
+@receiver(post_delete, sender=Quest)
+def invalidate_quest_catalog(sender, instance, **kwargs):
+    from game_engine.catalog import bump_quest_catalog_version # Избегаем циклического импорта
+    bump_quest_catalog_version()
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_item_catalog(sender, instance, **kwargs):
+    from game_engine.catalog import bump_item_catalog_version
+    bump_item_catalog_version()
+
+# Поддерживаем суммарные бонусы экипировки, если предмет изменили или удалили
+from django.db.models.signals import pre_delete
+
+@receiver(post_save, sender=Item)
+def update_equipment_totals(sender, instance, created, **kwargs):
+    if not created:
+        Equipment.objects.filter(weapon=instance).update(total_power=instance.power)
+        Equipment.objects.filter(armor=instance).update(total_defense=instance.defense)
+
+@receiver(pre_delete, sender=Item)
+def reset_equipment_totals(sender, instance, **kwargs):
+    Equipment.objects.filter(weapon=instance).update(total_power=0)
+    Equipment.objects.filter(armor=instance).update(total_defense=0)
+
+@receiver(post_save, sender=HeroQuest)
+def remember_started_quest(sender, instance, created, **kwargs):
+    if created:
+        from game_engine.catalog import quest_catalog
+        quest_catalog.mark_started(instance.hero_id, instance.quest_id)
+
+@receiver(post_delete, sender=HeroQuest)
+def forget_started_quest(sender, instance, **kwargs):
+    from game_engine.catalog import quest_catalog
+    quest_catalog.discard_started(instance.hero_id, instance.quest_id)
@@ -7,13 +7,21 @@ from django.core.paginator import Paginator
 from .models import Item, Inventory, Equipment, Quest, HeroQuest
 from .forms import UserQuestForm
 from heroes.models import Hero
+from heroes.snapshots import get_hero_or_404
+from game_engine.catalog import item_catalog
 
 @login_required
 def inventory_view(request):
     """Отображает инвентарь героя."""
-    hero = get_object_or_404(Hero, owner=request.user)
-    inventory_items = hero.inventory_items.all()
+    hero = get_hero_or_404(request.user.id)
+    inventory_items = list(hero.inventory_items.all())
+    # Предметы берем из каталога в памяти, а не отдельными запросами
+    for inventory_item in inventory_items:
+        item_catalog.attach(inventory_item, 'item')
     equipment = getattr(hero, 'equipment', None)
+    if equipment is not None:
+        item_catalog.attach(equipment, 'weapon')
+        item_catalog.attach(equipment, 'armor')
     
     context = {
         'hero': hero,
@@ -26,7 +34,7 @@ def inventory_view(request):
 def equip_item(request, item_id):
     """Экипирует предмет."""
     hero = get_object_or_404(Hero, owner=request.user)
-    item = get_object_or_404(Item, id=item_id)
+    item = item_catalog.get(item_id) or get_object_or_404(Item, id=item_id)
     inventory_item = get_object_or_404(Inventory, hero=hero, item=item)
     
     # Проверка, есть ли предмет в инвентаре
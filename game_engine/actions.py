@@ -0,0 +1,88 @@
+# game_engine/actions.py (новый файл)
+"""
+Реестр случайных действий героя.
+Действие - id, вес (с ограничением по состоянию и уровню героя), шаблон
+сообщения и необязательный обработчик. Ход выбирает действие одним взвешенным
+броском и вызывает его обработчик по таблице - без построения и разбора строк.
+Встроенные действия регистрируются в game_engine.core.
+
+Новое действие:
+
+    @action('dig', "{name} копает клад.", weight=2, min_level=5)
+    def _dig(state, effects, rng, quests, items):
+        state.gold += rng.randint(1, 20)
+        return None # None - в лог идет шаблон действия
+"""
+import random
+from bisect import bisect_right
+from itertools import accumulate
+
+# id -> Action, в порядке регистрации
+ACTIONS = {}
+# (состояние, уровень, множители) -> (действия, накопленные веса, сумма весов)
+_tables = {}
+
+
+class Action:
+    """Описание действия героя."""
+    __slots__ = ('id', 'template', 'weight', 'handler', 'states', 'min_level', 'max_level')
+
+    def __init__(self, action_id, template, weight=1, handler=None, states=('adventure',),
+                 min_level=1, max_level=None):
+        self.id = action_id
+        self.template = template
+        self.weight = weight
+        self.handler = handler
+        self.states = states
+        self.min_level = min_level
+        self.max_level = max_level
+
+    def available(self, state, level):
+        return (
+            state in self.states and level >= self.min_level
+            and (self.max_level is None or level <= self.max_level)
+        )
+
+    def message(self, name):
+        return self.template.format(name=name)
+
+
+def register_action(action_id, template, weight=1, handler=None, states=('adventure',),
+                    min_level=1, max_level=None):
+    """
+    Регистрирует (или заменяет) действие.
+    handler(state, effects, rng, quests, items) возвращает лог или None - тогда в лог идет шаблон.
+    """
+    registered = ACTIONS[action_id] = Action(action_id, template, weight, handler, states, min_level, max_level)
+    _tables.clear()
+    return registered
+
+
+def action(action_id, template, **options):
+    """Декоратор: регистрирует функцию как обработчик действия."""
+    def decorator(handler):
+        register_action(action_id, template, handler=handler, **options)
+        return handler
+    return decorator
+
+
+def _table(state, level, weights=()):
+    table = _tables.get((state, level, weights))
+    if table is None:
+        multipliers = dict(weights)
+        actions = [entry for entry in ACTIONS.values() if entry.available(state, level)]
+        cum_weights = list(accumulate(entry.weight * multipliers.get(entry.id, 1) for entry in actions))
+        table = _tables[(state, level, weights)] = (actions, cum_weights, cum_weights[-1] if actions else 0)
+    return table
+
+
+def pick_action(state='adventure', level=1, rng=random, weights=()):
+    """
+    Одно взвешенное случайное действие для состояния и уровня героя или None.
+    weights - множители весов ((id действия, множитель), ...), например от
+    мировых событий (game_engine.world); таблица для них тоже кэшируется.
+    """
+    actions, cum_weights, total = _table(state, level, weights)
+    if not actions:
+        return None
+    return actions[bisect_right(cum_weights, rng.random() * total)]
@@ -0,0 +1,209 @@
+# game_engine/batch.py
+"""
+Пакетная запись изменений, накопленных за один тик.
+Вместо hero.save() на каждое действие движок складывает изменения сюда,
+а задача тика сбрасывает их одним bulk_update/bulk_create на пачку героев.
+Характеристики героя пишутся как изменения относительно значений до хода
+(F('gold') + 5 и т.п.), так что параллельные действия игрока не теряются,
+а погибшего в это время героя тик не "воскрешает".
+"""
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F, Case, When, Value, IntegerField
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+from heroes.models import Hero
+from heroes.snapshots import store_snapshots
+from heroes.leaderboards import HERO_LEADERBOARD_FIELDS, update_heroes
+from events.models import HeroQuest, Inventory, Item
+from .metrics import TickMetrics
+
+# Поля героя, которые может менять ход движка
+HERO_TICK_FIELDS = [
+    'level', 'health', 'max_health', 'gold', 'experience', 'state',
+    'monsters_killed', 'quests_completed', 'deaths',
+    'next_action_at', 'last_updated', 'updated_at',
+]
+HERO_QUEST_TICK_FIELDS = ['status', 'progress', 'completed_at', 'updated_at']
+# Счетчики, которые тик прибавляет к значению в БД, а не перезаписывает
+HERO_DELTA_FIELDS = ('gold', 'experience', 'monsters_killed', 'quests_completed', 'deaths')
+# Характеристики, для которых запоминается значение до хода
+HERO_STAT_FIELDS = ('level', 'health', 'max_health', 'state') + HERO_DELTA_FIELDS
+
+
+class TickBatch:
+    """
+    Накопитель изменений героев, квестов и инвентаря за пачку героев.
+    """
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics or TickMetrics(enabled=False)  # Учет обращений к кэшу
+        self.heroes = {}               # pk -> Hero
+        self.baselines = {}            # pk -> характеристики героя до хода
+        self.hero_quests = {}          # pk -> HeroQuest (изменённые)
+        self.new_hero_quests = []      # Новые HeroQuest
+        self.found_items = defaultdict(int)  # (hero_id, item_id) -> количество
+
+    def track_hero(self, hero: Hero):
+        """
+        Запоминает характеристики героя до его первого хода в пакете,
+        чтобы при сбросе записать изменения, а не значения.
+        """
+        if hero.pk not in self.baselines:
+            self.baselines[hero.pk] = tuple(getattr(hero, field) for field in HERO_STAT_FIELDS)
+
+    def save_hero(self, hero: Hero):
+        """Помечает героя как изменённого."""
+        self.heroes[hero.pk] = hero
+
+    def save_hero_quest(self, hero_quest: HeroQuest):
+        """Помечает квест героя как изменённый."""
+        if hero_quest.pk is None:
+            # Квест еще не вставлен - попадет в bulk_create с текущими значениями
+            return
+        self.hero_quests[hero_quest.pk] = hero_quest
+
+    def add_hero_quest(self, hero_quest: HeroQuest):
+        """Добавляет новый квест героя для вставки."""
+        self.new_hero_quests.append(hero_quest)
+
+    def add_item(self, hero: Hero, item):
+        """Добавляет предмет в инвентарь героя (+1 к количеству)."""
+        self.found_items[(hero.pk, item.pk)] += 1
+
+    def flush(self):
+        """
+        Записывает все накопленные изменения в одной транзакции.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            if self.heroes:
+                heroes = list(self.heroes.values())
+                for hero in heroes:
+                    # bulk_update не обновляет auto_now поля сам
+                    hero.last_updated = now
+                    hero.updated_at = now
+                    baseline = self.baselines.get(hero.pk)
+                    if baseline is not None:
+                        for field, value in self._hero_updates(hero, baseline).items():
+                            setattr(hero, field, value)
+                Hero.objects.bulk_update(heroes, HERO_TICK_FIELDS)
+                self._reload_heroes(heroes)
+
+            if self.hero_quests:
+                hero_quests = list(self.hero_quests.values())
+                for hero_quest in hero_quests:
+                    hero_quest.updated_at = now
+                HeroQuest.objects.bulk_update(hero_quests, HERO_QUEST_TICK_FIELDS)
+
+            if self.new_hero_quests:
+                HeroQuest.objects.bulk_create(self.new_hero_quests)
+
+            if self.found_items:
+                self._flush_inventory(now)
+
+        if self.heroes:
+            # bulk_update не вызывает сигналы - обновляем снимки героев сами
+            with self.metrics.track_cache():
+                store_snapshots(self.heroes.values())
+            ranked = self._ranked_heroes()
+            if ranked:
+                with self.metrics.track_cache():
+                    update_heroes(ranked)
+        self.heroes.clear()
+        self.baselines.clear()
+        self.hero_quests.clear()
+        self.new_hero_quests.clear()
+        self.found_items.clear()
+
+    @staticmethod
+    def _hero_updates(hero: Hero, baseline):
+        """
+        Выражения для характеристик героя: изменения относительно значений до хода.
+        Нетронутые поля остаются как в БД, счетчики прибавляются, здоровье
+        прибавляется с ограничением [0, max_health], а 'dead', записанный
+        кем-то другим, не перезаписывается.
+        """
+        before = dict(zip(HERO_STAT_FIELDS, baseline))
+        updates = {}
+        for field in HERO_DELTA_FIELDS:
+            delta = getattr(hero, field) - before[field]
+            updates[field] = F(field) + delta if delta else F(field)
+        for field in ('level', 'max_health'):
+            value = getattr(hero, field)
+            updates[field] = Value(value) if value != before[field] else F(field)
+
+        health_delta = hero.health - before['health']
+        if health_delta:
+            updates['health'] = Case(
+                When(state='dead', then=F('health')),
+                default=Greatest(
+                    Least(F('health') + health_delta, updates['max_health'], output_field=IntegerField()),
+                    Value(0), output_field=IntegerField(),
+                ),
+                output_field=IntegerField(),
+            )
+        else:
+            updates['health'] = F('health')
+
+        if hero.state != before['state']:
+            updates['state'] = Case(When(state='dead', then=Value('dead')), default=Value(hero.state))
+        else:
+            updates['state'] = F('state')
+        return updates
+
+    @staticmethod
+    def _reload_heroes(heroes):
+        """Перечитывает записанные характеристики героев (с учетом чужих изменений)."""
+        rows = Hero.objects.filter(pk__in=[hero.pk for hero in heroes]).values_list('pk', *HERO_STAT_FIELDS)
+        values = {row[0]: row[1:] for row in rows}
+        for hero in heroes:
+            for field, value in zip(HERO_STAT_FIELDS, values.get(hero.pk, ())):
+                setattr(hero, field, value)
+
+    def _ranked_heroes(self):
+        """Герои, у которых за пакет изменились поля рейтингов (heroes.leaderboards)."""
+        positions = [HERO_STAT_FIELDS.index(field) for field in HERO_LEADERBOARD_FIELDS]
+        changed = []
+        for hero in self.heroes.values():
+            baseline = self.baselines.get(hero.pk)
+            if baseline is None or any(
+                getattr(hero, field) != baseline[position]
+                for field, position in zip(HERO_LEADERBOARD_FIELDS, positions)
+            ):
+                changed.append(hero)
+        return changed
+
+    def _flush_inventory(self, now):
+        """
+        Увеличивает количество существующих предметов и создаёт новые записи.
+        Каталог предметов в памяти воркера может еще помнить удаленный предмет
+        (до ENGINE_CATALOG_CHECK_SECONDS) - такие находки отбрасываются.
+        """
+        hero_ids = {hero_id for hero_id, _ in self.found_items}
+        item_ids = {item_id for _, item_id in self.found_items}
+        existing = Inventory.objects.filter(hero_id__in=hero_ids, item_id__in=item_ids)
+
+        to_update = []
+        for inventory_item in existing:
+            key = (inventory_item.hero_id, inventory_item.item_id)
+            if key in self.found_items:
+                inventory_item.quantity += self.found_items.pop(key)
+                inventory_item.updated_at = now
+                to_update.append(inventory_item)
+        if to_update:
+            Inventory.objects.bulk_update(to_update, ['quantity', 'updated_at'])
+
+        if not self.found_items:
+            return
+        # У найденных записей предмет точно есть; остальные сверяем с таблицей предметов
+        known_item_ids = set(Item.objects.filter(
+            pk__in={item_id for _, item_id in self.found_items}
+        ).values_list('pk', flat=True))
+        to_create = [
+            Inventory(hero_id=hero_id, item_id=item_id, quantity=quantity)
+            for (hero_id, item_id), quantity in self.found_items.items()
+            if item_id in known_item_ids
+        ]
+        if to_create:
+            Inventory.objects.bulk_create(to_create)
@@ -0,0 +1,244 @@
+# game_engine/benchmark.py (новый файл)
+"""
+Замер производительности движка на тестовой базе данных.
+
+Создает тестовую БД (как manage.py test), заполняет её N героями, квестами
+и предметами и прогоняет полный тик. Для каждой ветки хода (бой, отдых,
+квест, приключение, находка предмета) считает время и SQL-запросы на героя,
+для всего тика - героев в секунду и запросы на героя.
+Если запросов на героя больше бюджета (например, появился N+1),
+бросается QueryBudgetExceeded и процесс завершается с ошибкой.
+Те же бюджеты на 1000 героях проверяют тесты (game_engine/tests.py):
+    python manage.py test game_engine.tests
+
+Запуск:
+    python -m game_engine.benchmark 1000 10000 100000
+
+Тик пишет журналы, дельты и снимки героев в Redis - запускайте замер
+с настройками, где CACHES указывает на отдельную (не рабочую) базу Redis.
+"""
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Бюджет SQL-запросов на одного героя: в пакетном режиме ход не должен
+# обращаться к БД вовсе, все пишется одним сбросом пачки
+BRANCH_QUERY_BUDGETS = {
+    'fight': 0,
+    'rest': 0,
+    'quest': 0,
+    'adventure': 0,
+    'loot': 0,
+}
+# Запросов на героя за весь тик (выборка, prefetch и сброс - раз на пачку)
+TICK_QUERY_BUDGET = 0.1
+
+QUESTS_COUNT = 50
+ITEMS_COUNT = 100
+# Какие состояния раздаются героям при заполнении (по кругу)
+SEED_STATES = ('adventure', 'fight', 'rest', 'quest')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запросов к БД на героя больше, чем допускает бюджет."""
+
+
+def seed(size):
+    """
+    Заполняет БД size героями (по одному на игрока), квестами и предметами.
+    Каждый четвертый герой уже выполняет квест, ход наступил у всех.
+    """
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from accounts.models import PlayerProfile
+    from heroes.models import Hero
+    from events.models import Quest, Item, HeroQuest, Equipment
+
+    now = timezone.now()
+    quests = Quest.objects.bulk_create(
+        Quest(title=f"Квест {i}", description="Замер", required_level=1 + i % 3, is_approved=True)
+        for i in range(QUESTS_COUNT)
+    )
+    rarities = [rarity for rarity, _ in Item.RARITY_CHOICES]
+    item_types = [item_type for item_type, _ in Item.ITEM_TYPES]
+    Item.objects.bulk_create(
+        Item(
+            name=f"Предмет {i}", description="Замер",
+            item_type=item_types[i % len(item_types)], rarity=rarities[i % len(rarities)],
+            power=i % 10, defense=i % 7,
+        )
+        for i in range(ITEMS_COUNT)
+    )
+
+    User.objects.bulk_create(
+        User(username=f"bench_{i}", last_login=now) for i in range(size)
+    )
+    users = list(User.objects.filter(username__startswith='bench_').order_by('pk'))
+    PlayerProfile.objects.bulk_create(PlayerProfile(user=user) for user in users)
+    Hero.objects.bulk_create(
+        Hero(
+            name=f"Герой {i}", owner=user, state=SEED_STATES[i % len(SEED_STATES)],
+            health=100 - i % 60, next_action_at=now - timedelta(minutes=1),
+        )
+        for i, user in enumerate(users)
+    )
+    heroes = list(Hero.objects.filter(owner__in=users).order_by('pk').only('pk', 'state'))
+    Equipment.objects.bulk_create(Equipment(hero=hero) for hero in heroes)
+    HeroQuest.objects.bulk_create(
+        HeroQuest(
+            hero=hero, quest=quests[i % QUESTS_COUNT], status='in_progress',
+            progress=i % 10, started_at=now,
+        )
+        for i, hero in enumerate(heroes) if hero.state == 'quest'
+    )
+    return len(heroes)
+
+
+def measure_branches(heroes):
+    """
+    Прогоняет один ход для пачки героев как тик (TickBatch, буфер уведомлений)
+    и возвращает {ветка: [героев, секунд, запросов]}. Пачка не сохраняется.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from accounts.services import buffered_notifications
+    from .engine import engine
+    from .batch import TickBatch
+    from .combat import resolve_fights
+    from .metrics import hero_branch
+    from .catalog import quest_catalog, item_catalog
+    from .world import current_modifiers
+
+    # Справочники загружаются один раз на процесс - не считаем их в ветках
+    quest_catalog._refresh()
+    item_catalog._refresh()
+    stats = defaultdict(lambda: [0, 0.0, 0])
+    batch = TickBatch()
+    modifiers = current_modifiers()
+    hero_ids = [hero.pk for hero in heroes]
+    quest_catalog.prime_started(hero_ids)
+    try:
+        with buffered_notifications() as buffer:
+            fighters = [hero for hero in heroes if hero_branch(hero) == 'fight']
+            with CaptureQueriesContext(connection) as queries:
+                started_at = time.perf_counter()
+                resolve_fights(fighters, batch, modifiers=modifiers)
+                stats['fight'][1] += time.perf_counter() - started_at
+            stats['fight'][0] += len(fighters)
+            stats['fight'][2] += len(queries)
+
+            fighter_ids = {hero.pk for hero in fighters}
+            for hero in heroes:
+                if hero.pk in fighter_ids:
+                    continue
+                branch = hero_branch(hero)
+                found_before = sum(batch.found_items.values())
+                with CaptureQueriesContext(connection) as queries:
+                    started_at = time.perf_counter()
+                    engine.process_hero_turn(hero, batch, modifiers=modifiers)
+                    elapsed = time.perf_counter() - started_at
+                if sum(batch.found_items.values()) > found_before:
+                    branch = 'loot'
+                stats[branch][0] += 1
+                stats[branch][1] += elapsed
+                stats[branch][2] += len(queries)
+            # Замер не должен ничего записывать
+            buffer.pending.clear()
+    finally:
+        quest_catalog.forget_started(hero_ids)
+    return dict(stats)
+
+
+def measure_tick():
+    """Полный тик по всем героям (все шарды в этом процессе)."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from heroes.models import Hero
+    from . import tasks
+
+    heroes = Hero.objects.order_by('pk').values_list('pk', flat=True)
+    first_pk, last_pk = heroes.first(), heroes.last()
+    with CaptureQueriesContext(connection) as queries:
+        started_at = time.perf_counter()
+        result = tasks.process_hero_shard(first_pk, last_pk)
+        seconds = time.perf_counter() - started_at
+    return result['processed'], seconds, len(queries)
+
+
+def check_budgets(branches, tick):
+    """Бросает QueryBudgetExceeded, если какая-то ветка или тик превысили бюджет."""
+    errors = []
+    for branch, (count, _, queries) in branches.items():
+        budget = BRANCH_QUERY_BUDGETS.get(branch)
+        if budget is not None and count and queries / count > budget:
+            errors.append(f"{branch}: {queries / count:.3f} запросов на героя (бюджет {budget})")
+    processed, _, queries = tick
+    if processed and queries / processed > TICK_QUERY_BUDGET:
+        errors.append(f"тик: {queries / processed:.3f} запросов на героя (бюджет {TICK_QUERY_BUDGET})")
+    if errors:
+        raise QueryBudgetExceeded("; ".join(errors))
+
+
+def run_size(size, out=sys.stdout):
+    """Заполняет пустую БД size героями, замеряет ветки и тик, печатает отчет."""
+    from .tasks import _tick_queryset, HERO_TICK_CHUNK_SIZE
+
+    seed(size)
+    heroes = list(_tick_queryset()[:HERO_TICK_CHUNK_SIZE])
+    branches = measure_branches(heroes)
+    tick = measure_tick()
+
+    out.write(f"\n=== {size} героев ===\n")
+    for branch in sorted(branches):
+        count, seconds, queries = branches[branch]
+        out.write(
+            f"{branch:<10} героев: {count:>5}  мкс/герой: {seconds / count * 1e6:>9.1f}  "
+            f"запросов/герой: {queries / count:.3f}\n"
+        )
+    processed, seconds, queries = tick
+    out.write(
+        f"тик: {processed} героев за {seconds:.2f} с ({processed / seconds:.0f} героев/с), "
+        f"запросов: {queries} ({queries / max(processed, 1):.3f} на героя)\n"
+    )
+    check_budgets(branches, tick)
+    return branches, tick
+
+
+def run(sizes=DEFAULT_SIZES, out=sys.stdout):
+    """
+    Создает тестовую БД и прогоняет замер для каждого размера
+    (перед каждым размером таблицы очищаются).
+    """
+    from django.core.management import call_command
+    from django.test.utils import setup_databases, teardown_databases, setup_test_environment
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        for size in sizes:
+            call_command('flush', interactive=False, verbosity=0)
+            run_size(size, out)
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def main(argv=None):
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'divine_heroes.settings')
+    django.setup()
+    argv = sys.argv[1:] if argv is None else argv
+    sizes = [int(arg) for arg in argv] or DEFAULT_SIZES
+    try:
+        run(sizes)
+    except QueryBudgetExceeded as error:
+        sys.stderr.write(f"Превышен бюджет запросов: {error}\n")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
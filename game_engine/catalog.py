@@ -0,0 +1,232 @@
+# game_engine/catalog.py
+"""
+Справочники движка, которые держатся в памяти воркера.
+Каталог квестов раскладывает одобренные квесты по требуемому уровню,
+так что выбор квеста для героя не требует запросов к БД.
+Каталог предметов хранит все предметы и таблицы псевдонимов (alias method)
+для выбора добычи с учетом редкости за O(1).
+"""
+import abc
+import bisect
+import time
+from django.conf import settings
+from django.core.cache import cache
+from events.models import Quest, HeroQuest, Item
+
+QUEST_CATALOG_VERSION_KEY = "quest_catalog_version"
+ITEM_CATALOG_VERSION_KEY = "item_catalog_version"
+# Как часто (в секундах) воркер сверяет версии каталогов с кэшем
+CATALOG_CHECK_SECONDS = getattr(settings, 'ENGINE_CATALOG_CHECK_SECONDS', 30)
+# Сколько случайных попыток делаем, прежде чем перебрать кандидатов явно
+QUEST_PICK_ATTEMPTS = 8
+
+# Вес редкости при выпадении предмета
+ITEM_RARITY_WEIGHTS = getattr(settings, 'ITEM_RARITY_WEIGHTS', {
+    'common': 60,
+    'uncommon': 25,
+    'rare': 10,
+    'epic': 4,
+    'legendary': 1,
+})
+# Прибавка к весу редкости за каждую ступень уровня героя (редкие предметы чаще у опытных)
+ITEM_RARITY_LEVEL_BONUS = getattr(settings, 'ITEM_RARITY_LEVEL_BONUS', {
+    'common': 0.0,
+    'uncommon': 0.1,
+    'rare': 0.2,
+    'epic': 0.3,
+    'legendary': 0.4,
+})
+# Ступень уровня: герои уровней 1-5 в ступени 0, 6-10 в ступени 1 и т.д.
+ITEM_LEVEL_TIER_SIZE = 5
+ITEM_MAX_LEVEL_TIER = 10
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+def bump_quest_catalog_version():
+    """Помечает каталог квестов устаревшим во всех процессах."""
+    _bump_version(QUEST_CATALOG_VERSION_KEY)
+
+def bump_item_catalog_version():
+    """Помечает каталог предметов устаревшим во всех процессах."""
+    _bump_version(ITEM_CATALOG_VERSION_KEY)
+
+
+class VersionedCatalog(abc.ABC):
+    """
+    Базовый справочник в памяти процесса, который перечитывается,
+    когда меняется его версия в общем кэше.
+    """
+    version_key = None
+
+    def __init__(self):
+        self._version = None
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        """Перечитывает данные, если их версия в кэше изменилась."""
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < CATALOG_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        version = cache.get(self.version_key, 0)
+        if version == self._version:
+            return
+        self._load()
+        self._version = version
+
+    @abc.abstractmethod
+    def _load(self):
+        """Загружает данные справочника из БД."""
+
+
+class AliasTable:
+    """
+    Таблица псевдонимов Воуза: выбор индекса с заданными весами за O(1).
+    """
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = float(sum(weights))
+        scaled = [weight * count / total for weight in weights]
+        self.probability = [0.0] * count
+        self.alias = list(range(count))
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        for i in small + large:
+            self.probability[i] = 1.0
+
+    def sample(self, rng):
+        i = rng.randrange(len(self.probability))
+        return i if rng.random() < self.probability[i] else self.alias[i]
+
+
+class QuestCatalog(VersionedCatalog):
+    """
+    Одобренные квесты, отсортированные по required_level,
+    и множества уже начатых квестов для героев текущей пачки.
+    """
+    version_key = QUEST_CATALOG_VERSION_KEY
+
+    def __init__(self):
+        super().__init__()
+        self._quests = []   # Quest, отсортированы по required_level
+        self._levels = []   # required_level параллельно self._quests
+        self._started = {}  # id героя -> set(id квестов)
+
+    def _load(self):
+        self._quests = list(Quest.objects.filter(is_approved=True).order_by('required_level', 'pk'))
+        self._levels = [quest.required_level for quest in self._quests]
+
+    def prime_started(self, hero_ids):
+        """Загружает начатые квесты для пачки героев одним запросом."""
+        started = {hero_id: set() for hero_id in hero_ids}
+        rows = HeroQuest.objects.filter(hero_id__in=hero_ids).values_list('hero_id', 'quest_id')
+        for hero_id, quest_id in rows:
+            started[hero_id].add(quest_id)
+        self._started.update(started)
+
+    def forget_started(self, hero_ids):
+        """Забывает начатые квесты героев после обработки пачки."""
+        for hero_id in hero_ids:
+            self._started.pop(hero_id, None)
+
+    def started_ids(self, hero_id):
+        """Id квестов, которые герой уже начинал."""
+        started = self._started.get(hero_id)
+        if started is None:
+            # Герой не из текущей пачки - спрашиваем БД, но не запоминаем
+            started = set(HeroQuest.objects.filter(hero_id=hero_id).values_list('quest_id', flat=True))
+        return started
+
+    def mark_started(self, hero_id, quest_id):
+        if hero_id in self._started:
+            self._started[hero_id].add(quest_id)
+
+    def discard_started(self, hero_id, quest_id):
+        if hero_id in self._started:
+            self._started[hero_id].discard(quest_id)
+
+    def pick(self, hero, rng):
+        """
+        Возвращает случайный доступный герою квест или None.
+        Равномерный выбор с отбраковкой уже начатых: O(1) в среднем.
+        """
+        self._refresh()
+        available_count = bisect.bisect_right(self._levels, hero.level)
+        if not available_count:
+            return None
+        started = self.started_ids(hero.pk)
+        for _ in range(QUEST_PICK_ATTEMPTS):
+            quest = self._quests[rng.randrange(available_count)]
+            if quest.pk not in started:
+                return quest
+        # Почти все квесты уже начаты - выбираем из оставшихся явно
+        candidates = [quest for quest in self._quests[:available_count] if quest.pk not in started]
+        return rng.choice(candidates) if candidates else None
+
+
+class ItemCatalog(VersionedCatalog):
+    """
+    Все предметы игры и таблицы выпадения по ступеням уровня героя.
+    Используется движком для добычи и представлениями инвентаря.
+    """
+    version_key = ITEM_CATALOG_VERSION_KEY
+
+    def __init__(self):
+        super().__init__()
+        self._items = []       # Item в порядке таблиц выпадения
+        self._by_id = {}       # id -> Item
+        self._drop_tables = {} # ступень уровня -> AliasTable
+
+    def _load(self):
+        self._items = list(Item.objects.order_by('pk'))
+        self._by_id = {item.pk: item for item in self._items}
+        self._drop_tables = {}
+
+    def get(self, item_id):
+        """Возвращает предмет по id или None."""
+        self._refresh()
+        return self._by_id.get(item_id)
+
+    def attach(self, obj, field_name):
+        """
+        Подставляет в obj.<field_name> предмет из каталога вместо запроса к БД.
+        """
+        item_id = getattr(obj, f"{field_name}_id")
+        item = self.get(item_id) if item_id is not None else None
+        if item is not None:
+            setattr(obj, field_name, item)
+
+    def _drop_table(self, tier):
+        table = self._drop_tables.get(tier)
+        if table is None:
+            weights = [
+                ITEM_RARITY_WEIGHTS.get(item.rarity, 1) * (1 + tier * ITEM_RARITY_LEVEL_BONUS.get(item.rarity, 0))
+                for item in self._items
+            ]
+            table = self._drop_tables[tier] = AliasTable(weights)
+        return table
+
+    def pick(self, hero, rng):
+        """Случайный предмет с учетом редкости и уровня героя или None."""
+        self._refresh()
+        if not self._items:
+            return None
+        tier = min((hero.level - 1) // ITEM_LEVEL_TIER_SIZE, ITEM_MAX_LEVEL_TIER)
+        return self._items[self._drop_table(tier).sample(rng)]
+
+
+# Каталоги процесса (у каждого воркера свои)
+quest_catalog = QuestCatalog()
+item_catalog = ItemCatalog()
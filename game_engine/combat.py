@@ -0,0 +1,93 @@
+# game_engine/combat.py
+"""
+Пакетный расчет боя: один раунд для всех сражающихся героев пачки сразу.
+Правила те же, что в core.fight, но броски и арифметика делаются векторно
+в NumPy над списком HeroState; resolve_fights применяет итог к моделям.
+"""
+import numpy as np
+from .batch import TickBatch
+from .core import NOTIFICATION, NO_MODIFIERS
+from .persistence import load_state, apply_turn
+
+
+def fight_round(states, rng=None, modifiers=NO_MODIFIERS):
+    """
+    Разыгрывает один раунд боя для списка HeroState в состоянии 'fight'.
+    modifiers - мировые модификаторы (core.WorldModifiers), здесь - множитель опыта.
+    Меняет состояния на месте и возвращает список (лог, эффекты) в том же порядке;
+    тексты и уведомления совпадают с core.fight.
+    """
+    if not states:
+        return []
+    rng = rng or np.random.default_rng()
+    count = len(states)
+
+    defense = np.array([state.defense for state in states], dtype=np.int64)
+    health = np.array([state.health for state in states], dtype=np.int64)
+    max_health = np.array([state.max_health for state in states], dtype=np.int64)
+    level = np.array([state.level for state in states], dtype=np.int64)
+    experience = np.array([state.experience for state in states], dtype=np.int64)
+
+    # Броски на всех сразу
+    damage_to_hero = np.maximum(1, rng.integers(5, 21, count) - defense // 3) # Защита снижает урон
+    won = rng.random(count) > 0.5 # 50% шанс победы героя
+    exp_gain = np.where(won, rng.integers(10, 31, count), 0)
+    gold_gain = np.where(won, rng.integers(1, 11, count), 0)
+    if modifiers.xp_multiplier != 1:
+        exp_gain = np.rint(exp_gain * modifiers.xp_multiplier).astype(np.int64)
+    hp_increase = rng.integers(10, 21, count)
+
+    health = np.maximum(0, health - damage_to_hero)
+    experience = experience + exp_gain
+    died = ~won & (health == 0)
+
+    # Повышение уровня (только у победителей, как в core.check_level_up)
+    required_exp = level * 100
+    level_up = won & (experience >= required_exp)
+    experience = np.where(level_up, experience - required_exp, experience)
+    max_health = np.where(level_up, max_health + hp_increase, max_health)
+    health = np.where(level_up, max_health, health)
+    level = np.where(level_up, level + 1, level)
+
+    results = []
+    for i, state in enumerate(states):
+        state.health = int(health[i])
+        state.max_health = int(max_health[i])
+        state.level = int(level[i])
+        state.experience = int(experience[i])
+        effects = []
+        if won[i]:
+            state.gold += int(gold_gain[i])
+            state.monsters_killed += 1
+            state.state = 'adventure'
+            log = f"{state.name} победил монстра! Получено {exp_gain[i]} опыта и {gold_gain[i]} золота."
+            effects.append((
+                NOTIFICATION, "Победа в бою!",
+                f"{state.name} победил монстра и получил {exp_gain[i]} опыта и {gold_gain[i]} золота!",
+                'success',
+            ))
+            if level_up[i]:
+                log += f" {state.name} достигает уровня {state.level}! Максимальное здоровье увеличено на {hp_increase[i]}."
+        elif died[i]:
+            state.state = 'dead'
+            state.deaths += 1
+            log = f"{state.name} был побежден в бою и погиб."
+        else:
+            log = f"{state.name} сражается с монстром. Получено {damage_to_hero[i]} урона. Здоровье: {state.health}/{state.max_health}"
+        results.append((log, effects))
+    return results
+
+
+def resolve_fights(heroes, batch: TickBatch, rng=None, modifiers=NO_MODIFIERS):
+    """
+    Один раунд боя для списка героев в состоянии 'fight'.
+    Изменения записываются через batch. Возвращает словарь {id героя: лог}.
+    """
+    for hero in heroes:
+        batch.track_hero(hero)
+    states = [load_state(hero) for hero in heroes]
+    logs = {}
+    for hero, state, (log, effects) in zip(heroes, states, fight_round(states, rng, modifiers)):
+        apply_turn(hero, state, effects, batch)
+        logs[hero.pk] = log
+    return logs
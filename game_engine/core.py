@@ -0,0 +1,307 @@
+# game_engine/core.py (новый файл)
+"""
+Правила хода героя без ORM.
+Ход работает с компактной записью HeroState (__slots__), меняет её на месте
+и возвращает лог и список эффектов: начатые/продвинутые/завершенные квесты,
+найденные предметы и уведомления. Применяет эффекты к моделям и пишет их в БД
+game_engine.persistence - так правила можно гонять миллионами ходов
+в тестах и пакетных задачах без базы данных.
+Справочники квестов и предметов передаются параметрами
+(по умолчанию - каталоги процесса из game_engine.catalog).
+"""
+import random
+import logging
+from .actions import action, register_action, pick_action
+
+logger = logging.getLogger(__name__)
+
+# Виды эффектов. Эффект - кортеж (вид, ...):
+QUEST_STARTED = 'quest_started'      # (вид, ActiveQuest)
+QUEST_PROGRESS = 'quest_progress'    # (вид, ActiveQuest)
+QUEST_COMPLETED = 'quest_completed'  # (вид, ActiveQuest)
+ITEM_FOUND = 'item_found'            # (вид, предмет)
+NOTIFICATION = 'notification'        # (вид, заголовок, текст, тип уведомления)
+
+# Поля героя, которые меняют правила (совпадают с полями модели Hero)
+HERO_STATE_FIELDS = (
+    'level', 'health', 'max_health', 'gold', 'experience', 'state',
+    'monsters_killed', 'quests_completed', 'deaths',
+)
+
+class ActiveQuest:
+    """Квест в процессе: квест из каталога, прогресс и ссылка хранилища (HeroQuest или None)."""
+    __slots__ = ('quest', 'progress', 'ref')
+
+    def __init__(self, quest, progress=0, ref=None):
+        self.quest = quest
+        self.progress = progress
+        self.ref = ref
+
+
+class WorldModifiers:
+    """
+    Действующие мировые модификаторы (game_engine.world): множитель опыта
+    и множители весов действий ((id действия, множитель), ...).
+    """
+    __slots__ = ('xp_multiplier', 'action_weights')
+
+    def __init__(self, xp_multiplier=1.0, action_weights=()):
+        self.xp_multiplier = xp_multiplier
+        self.action_weights = action_weights
+
+    def scale_experience(self, amount):
+        """Опыт с учетом множителя."""
+        if self.xp_multiplier == 1:
+            return amount
+        return int(round(amount * self.xp_multiplier))
+
+# Модификаторы по умолчанию - мировых событий нет
+NO_MODIFIERS = WorldModifiers()
+
+
+class HeroState:
+    """
+    Компактное состояние героя для правил: характеристики, бонусы экипировки
+    и активные квесты (первый в списке - текущий).
+    """
+    __slots__ = ('pk', 'name') + HERO_STATE_FIELDS + ('power', 'defense', 'quests')
+
+    def __init__(self, pk, name, level=1, health=100, max_health=100, gold=10, experience=0,
+                 state='adventure', monsters_killed=0, quests_completed=0, deaths=0,
+                 power=0, defense=0, quests=None):
+        self.pk = pk
+        self.name = name
+        self.level = level
+        self.health = health
+        self.max_health = max_health
+        self.gold = gold
+        self.experience = experience
+        self.state = state
+        self.monsters_killed = monsters_killed
+        self.quests_completed = quests_completed
+        self.deaths = deaths
+        self.power = power
+        self.defense = defense
+        self.quests = quests if quests is not None else []
+
+    @property
+    def quest(self):
+        """Текущий квест или None."""
+        return self.quests[0] if self.quests else None
+
+    def stats(self):
+        """Характеристики кортежем (для сравнения до и после хода)."""
+        return tuple(getattr(self, field) for field in HERO_STATE_FIELDS)
+
+
+def random_action(name, rng=random, level=1):
+    """Сообщение случайного действия героя в приключении."""
+    return pick_action('adventure', level, rng).message(name)
+
+
+def take_turn(state: HeroState, rng=random, quests=None, items=None, modifiers=NO_MODIFIERS):
+    """
+    Один ход героя. Возвращает (лог, эффекты).
+    quests и items - справочники с методом pick(hero, rng),
+    modifiers - действующие мировые модификаторы (WorldModifiers).
+    """
+    if quests is None or items is None:
+        from .catalog import quest_catalog, item_catalog
+        quests = quests or quest_catalog
+        items = items or item_catalog
+    effects = []
+
+    # Герой мертв - ничего не делает
+    if state.state == 'dead':
+        return f"{state.name} мертв и не может действовать.", effects
+
+    # --- Обработка квестов ---
+    active = state.quest
+    if active is not None:
+        # Простая логика: герой работает над квестом
+        active.progress += rng.randint(1, 3)
+        effects.append((QUEST_PROGRESS, active))
+        # Квест завершается при прогрессе 10
+        if active.progress >= 10:
+            return complete_quest(state, effects, rng, modifiers), effects
+        return f"{state.name} работает над квестом '{active.quest.title}'. Прогресс: {active.progress}/10", effects
+
+    # --- Обработка состояний ---
+
+    # Герой отдыхает - восстанавливает здоровье
+    if state.state == 'rest':
+        heal_amount = rng.randint(5, 15)
+        heal_amount += state.defense // 2 # Бонус к восстановлению от защиты
+        state.health = min(state.max_health, state.health + heal_amount)
+        state.state = 'adventure'
+        return f"{state.name} отдыхает и восстанавливает {heal_amount} здоровья. Здоровье: {state.health}/{state.max_health}", effects
+
+    # Герой в бою
+    if state.state == 'fight':
+        return fight(state, effects, rng, modifiers), effects
+
+    # Остальные состояния - приключение: случайное действие из реестра
+    # (действия состояния, а если их нет - действия приключения)
+    weights = modifiers.action_weights
+    chosen = pick_action(state.state, state.level, rng, weights) or pick_action('adventure', state.level, rng, weights)
+    if chosen is None:
+        return f"{state.name} бездействует.", effects
+    logger.debug("Герой %s: %s", state.name, chosen.id)
+    action_log = chosen.handler(state, effects, rng, quests, items) if chosen.handler else None
+    if action_log is None:
+        action_log = chosen.message(state.name)
+
+    # Простая проверка на отдых (если здоровье ниже 30%)
+    if state.health < state.max_health * 0.3:
+        if rng.random() < 0.3: # 30% шанс пойти отдыхать
+            state.state = 'rest'
+            action_log += f" {state.name} чувствует усталость и решает отдохнуть."
+
+    return action_log, effects
+
+
+def fight(state: HeroState, effects, rng=random, modifiers=NO_MODIFIERS):
+    """Один раунд боя."""
+    damage_to_hero = max(1, rng.randint(5, 20) - state.defense // 3) # Защита снижает урон
+
+    state.health = max(0, state.health - damage_to_hero)
+
+    if rng.random() > 0.5: # 50% шанс победы героя
+        exp_gain = modifiers.scale_experience(rng.randint(10, 30))
+        gold_gain = rng.randint(1, 10)
+        state.experience += exp_gain
+        state.gold += gold_gain
+        state.monsters_killed += 1
+        state.state = 'adventure'
+        log = f"{state.name} победил монстра! Получено {exp_gain} опыта и {gold_gain} золота."
+        effects.append((
+            NOTIFICATION, "Победа в бою!",
+            f"{state.name} победил монстра и получил {exp_gain} опыта и {gold_gain} золота!",
+            'success',
+        ))
+        level_up_log = check_level_up(state, rng)
+        if level_up_log:
+            log += f" {level_up_log}"
+        return log
+
+    if state.health == 0:
+        state.state = 'dead'
+        state.deaths += 1
+        return f"{state.name} был побежден в бою и погиб."
+    return f"{state.name} сражается с монстром. Получено {damage_to_hero} урона. Здоровье: {state.health}/{state.max_health}"
+
+
+def start_random_quest(state: HeroState, effects, rng=random, quests=None):
+    """Пытается начать случайный доступный герою квест. Возвращает лог или None."""
+    quest = quests.pick(state, rng)
+    if quest is None:
+        return None # Нет доступных квестов
+    active = ActiveQuest(quest)
+    state.quests.insert(0, active)
+    effects.append((QUEST_STARTED, active))
+    return f"{state.name} получает новое задание: '{quest.title}'!"
+
+
+def complete_quest(state: HeroState, effects, rng=random, modifiers=NO_MODIFIERS):
+    """Завершает текущий квест и выдает награду."""
+    active = state.quests.pop(0)
+    quest = active.quest
+    effects.append((QUEST_COMPLETED, active))
+
+    reward_experience = modifiers.scale_experience(quest.reward_experience)
+    state.experience += reward_experience
+    state.gold += quest.reward_gold
+    state.quests_completed += 1
+    log = f"{state.name} успешно завершает квест '{quest.title}'! Получено {reward_experience} опыта и {quest.reward_gold} золота."
+    effects.append((
+        NOTIFICATION, f"Квест завершен: {quest.title}",
+        f"Ваш герой {state.name} завершил квест '{quest.title}' и получил {reward_experience} опыта и {quest.reward_gold} золота!",
+        'success',
+    ))
+
+    level_up_log = check_level_up(state, rng)
+    if level_up_log:
+        log += f" {level_up_log}"
+        effects.append((NOTIFICATION, f"{state.name} достиг нового уровня!", level_up_log, 'success'))
+
+    # После завершения квеста герой снова в приключениях
+    state.state = 'adventure'
+    return log
+
+
+def check_level_up(state: HeroState, rng=random):
+    """Повышает уровень, если набрано достаточно опыта. Возвращает лог или None."""
+    required_exp = state.level * 100
+    if state.experience < required_exp:
+        return None
+    state.level += 1
+    state.experience -= required_exp
+    # Увеличиваем максимальное здоровье при повышении уровня
+    hp_increase = rng.randint(10, 20)
+    state.max_health += hp_increase
+    state.health = state.max_health # Полное восстановление при level-up
+    return f"{state.name} достигает уровня {state.level}! Максимальное здоровье увеличено на {hp_increase}."
+
+
+def find_random_item(state: HeroState, effects, rng=random, items=None):
+    """Герой находит случайный предмет. Возвращает лог или None."""
+    item = items.pick(state, rng)
+    if item is None:
+        return None # Нет предметов
+    effects.append((ITEM_FOUND, item))
+    return f"{state.name} находит {item.name}! Предмет добавлен в инвентарь."
+
+
+# --- Действия героя в приключении (см. game_engine.actions) ---
+
+register_action('trail', "{name} идет по тропе в поисках приключений.")
+register_action('look_around', "{name} осматривает окрестности, оглядывая каждый куст.")
+
+@action('find_gold', "{name} находит немного золота!")
+def _find_gold(state, effects, rng, quests, items):
+    gold_found = rng.randint(1, 5)
+    state.gold += gold_found
+    return f"{state.name} находит немного золота! +{gold_found} золота. Всего: {state.gold}"
+
+@action('meet_monster', "{name} сталкивается с монстром!")
+def _meet_monster(state, effects, rng, quests, items):
+    state.state = 'fight'
+    return f"{state.name} сталкивается с монстром! Начинается бой."
+
+register_action('campfire', "{name} отдыхает у костра, восстанавливая силы.")
+register_action('whisper', "{name} слышит странный шепот из кустов...")
+
+@action('artifact', "{name} натыкается на древний артефакт!")
+def _artifact(state, effects, rng, quests, items):
+    # Если предметов нет, в лог идет шаблон
+    return find_random_item(state, effects, rng, items)
+
+@action('stranger_quest', "{name} получает задание от таинственного незнакомца.")
+def _stranger_quest(state, effects, rng, quests, items):
+    # Если квест не начался, герой остается в состоянии приключения
+    return start_random_quest(state, effects, rng, quests)
+
+register_action('guild_tournament', "{name} участвует в гильдейском турнире.")
+
+@action('fishing', "{name} отправляется на рыбалку.")
+def _fishing(state, effects, rng, quests, items):
+    if rng.choice([True, False]):
+        state.gold += 2
+        return f"{state.name} ловит рыбу и продает её за 2 золота."
+    return f"{state.name} сидит у реки, но рыба не клюёт."
+
+register_action('old_map', "{name} изучает старинную карту.")
+register_action('help_farmer', "{name} помогает крестьянину с урожаем.")
+
+
+def simulate(states, turns, rng=random, quests=None, items=None, modifiers=NO_MODIFIERS):
+    """
+    Прогоняет turns ходов для каждого состояния без сохранения.
+    Возвращает список эффектов по героям (для тестов и пакетных расчетов).
+    """
+    all_effects = {state.pk: [] for state in states}
+    for _ in range(turns):
+        for state in states:
+            _, effects = take_turn(state, rng, quests, items, modifiers)
+            all_effects[state.pk].extend(effects)
+    return all_effects
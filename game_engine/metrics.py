@@ -0,0 +1,147 @@
+# game_engine/metrics.py (новый файл)
+"""
+Метрики тика: сколько героев прошло через каждую ветку хода и за сколько,
+гистограммы задержек, запросы к БД и их время, обращения к кэшу/Redis
+и самые медленные герои.
+Каждый шард собирает свои метрики, finalize_hero_tick объединяет их
+и кладет в сводку тика (кэш, ключ hero_tick_summary).
+Сбор стоит пару вызовов perf_counter на героя и одну обертку на запрос к БД.
+"""
+import heapq
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+
+ENGINE_METRICS_ENABLED = getattr(settings, 'ENGINE_METRICS_ENABLED', True)
+# Сколько самых медленных героев хранить в сводке
+ENGINE_METRICS_SLOWEST = getattr(settings, 'ENGINE_METRICS_SLOWEST', 10)
+# Верхние границы корзин гистограммы задержки хода, микросекунды (последняя - все остальное)
+LATENCY_BUCKETS_US = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+
+def _bucket(seconds):
+    micros = seconds * 1e6
+    for index, bound in enumerate(LATENCY_BUCKETS_US):
+        if micros <= bound:
+            return index
+    return len(LATENCY_BUCKETS_US)
+
+
+def hero_branch(hero):
+    """Ветка, по которой пойдет ход героя: quest, если есть активный квест, иначе состояние."""
+    from .persistence import active_quest # Избегаем циклического импорта
+    if active_quest(hero) is not None:
+        return 'quest'
+    return hero.state
+
+
+class TickMetrics:
+    """
+    Накопитель метрик одного шарда (или всего тика после merge).
+    При enabled=False все методы ничего не делают.
+    """
+
+    def __init__(self, enabled=None):
+        self.enabled = ENGINE_METRICS_ENABLED if enabled is None else enabled
+        self.branches = {}          # ветка -> {'count', 'seconds', 'histogram'}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.cache_round_trips = 0
+        self.cache_seconds = 0.0
+        self.slowest = []           # куча (секунды, id героя, имя)
+
+    def record_turn(self, hero, branch, seconds):
+        """Учитывает один ход героя по ветке branch."""
+        if not self.enabled:
+            return
+        stats = self.branches.get(branch)
+        if stats is None:
+            stats = self.branches[branch] = {
+                'count': 0, 'seconds': 0.0, 'histogram': [0] * (len(LATENCY_BUCKETS_US) + 1),
+            }
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['histogram'][_bucket(seconds)] += 1
+        entry = (seconds, hero.pk, hero.name)
+        if len(self.slowest) < ENGINE_METRICS_SLOWEST:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def _db_wrapper(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_seconds += time.perf_counter() - started_at
+
+    @contextmanager
+    def track_db(self):
+        """Считает запросы к БД (и их время) внутри блока."""
+        if not self.enabled:
+            yield
+            return
+        with connection.execute_wrapper(self._db_wrapper):
+            yield
+
+    @contextmanager
+    def track_cache(self, round_trips=1):
+        """Учитывает обращение (или пайплайн) к кэшу/Redis внутри блока."""
+        if not self.enabled:
+            yield
+            return
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.cache_round_trips += round_trips
+            self.cache_seconds += time.perf_counter() - started_at
+
+    def as_dict(self):
+        """Метрики в виде, пригодном для JSON и передачи между задачами Celery."""
+        return {
+            'branches': self.branches,
+            'db_queries': self.db_queries,
+            'db_seconds': self.db_seconds,
+            'cache_round_trips': self.cache_round_trips,
+            'cache_seconds': self.cache_seconds,
+            'slowest': [
+                {'seconds': seconds, 'hero_id': hero_id, 'name': name}
+                for seconds, hero_id, name in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+    @classmethod
+    def merge(cls, dicts):
+        """Объединяет результаты as_dict() нескольких шардов."""
+        merged = cls(enabled=True)
+        for data in dicts:
+            if not data:
+                continue
+            for branch, stats in data['branches'].items():
+                total = merged.branches.setdefault(branch, {
+                    'count': 0, 'seconds': 0.0, 'histogram': [0] * (len(LATENCY_BUCKETS_US) + 1),
+                })
+                total['count'] += stats['count']
+                total['seconds'] += stats['seconds']
+                total['histogram'] = [a + b for a, b in zip(total['histogram'], stats['histogram'])]
+            merged.db_queries += data['db_queries']
+            merged.db_seconds += data['db_seconds']
+            merged.cache_round_trips += data['cache_round_trips']
+            merged.cache_seconds += data['cache_seconds']
+            merged.slowest.extend(
+                (entry['seconds'], entry['hero_id'], entry['name']) for entry in data['slowest']
+            )
+        merged.slowest = heapq.nlargest(ENGINE_METRICS_SLOWEST, merged.slowest)
+        heapq.heapify(merged.slowest)
+        return merged
+
+    def summary(self):
+        """as_dict() плюс средняя задержка по веткам и границы корзин гистограмм."""
+        data = self.as_dict()
+        for stats in data['branches'].values():
+            stats['avg_us'] = stats['seconds'] / stats['count'] * 1e6 if stats['count'] else 0
+        data['histogram_buckets_us'] = list(LATENCY_BUCKETS_US)
+        return data
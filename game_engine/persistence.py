@@ -0,0 +1,122 @@
+# game_engine/persistence.py (новый файл)
+"""
+Связь правил (game_engine.core) с моделями: собирает HeroState из героя
+и применяет эффекты хода к Hero, HeroQuest и Inventory - сразу или через TickBatch.
+"""
+from django.utils import timezone
+from heroes.models import Hero
+from events.models import HeroQuest, Inventory
+from accounts.services import send_hero_notification
+from .batch import TickBatch
+from .catalog import quest_catalog
+from .core import (
+    HeroState, ActiveQuest, HERO_STATE_FIELDS,
+    QUEST_STARTED, QUEST_PROGRESS, QUEST_COMPLETED, ITEM_FOUND, NOTIFICATION,
+)
+
+
+def active_quests(hero: Hero):
+    """
+    Активные квесты героя по порядку.
+    Использует предзагруженный hero.active_quests, если он есть.
+    """
+    quests = getattr(hero, 'active_quests', None)
+    if quests is not None:
+        return quests
+    return list(hero.quests.filter(status='in_progress').select_related('quest').order_by('pk'))
+
+def active_quest(hero: Hero):
+    """Первый активный квест героя или None."""
+    quests = active_quests(hero)
+    return quests[0] if quests else None
+
+def gear_bonuses(hero: Hero):
+    """Возвращает (сила, защита) от экипировки героя."""
+    if not hasattr(hero, 'equipment'):
+        return 0, 0
+    return hero.equipment.get_total_power(), hero.equipment.get_total_defense()
+
+def load_state(hero: Hero):
+    """Собирает HeroState из героя, его экипировки и активных квестов."""
+    power, defense = gear_bonuses(hero)
+    return HeroState(
+        hero.pk, hero.name,
+        level=hero.level, health=hero.health, max_health=hero.max_health,
+        gold=hero.gold, experience=hero.experience, state=hero.state,
+        monsters_killed=hero.monsters_killed, quests_completed=hero.quests_completed,
+        deaths=hero.deaths, power=power, defense=defense,
+        quests=[ActiveQuest(hero_quest.quest, hero_quest.progress, hero_quest) for hero_quest in active_quests(hero)],
+    )
+
+def save_hero(hero: Hero, batch: TickBatch = None):
+    """Сохраняет героя сразу или откладывает запись в пакет."""
+    if batch is None:
+        hero.save()
+    else:
+        batch.save_hero(hero)
+
+def save_hero_quest(hero_quest: HeroQuest, batch: TickBatch = None):
+    """Сохраняет квест героя сразу или откладывает запись в пакет."""
+    if batch is None:
+        hero_quest.save()
+    else:
+        batch.save_hero_quest(hero_quest)
+
+def apply_turn(hero: Hero, state: HeroState, effects, batch: TickBatch = None, before=None):
+    """
+    Переносит состояние и эффекты хода на модели.
+    before - state.stats() до хода: герой сохраняется, только если что-то изменилось.
+    """
+    for field in HERO_STATE_FIELDS:
+        setattr(hero, field, getattr(state, field))
+
+    now = timezone.now()
+    for effect in effects:
+        kind = effect[0]
+        if kind == QUEST_PROGRESS:
+            active = effect[1]
+            active.ref.progress = active.progress
+            save_hero_quest(active.ref, batch)
+        elif kind == QUEST_COMPLETED:
+            hero_quest = effect[1].ref
+            hero_quest.status = 'completed'
+            hero_quest.completed_at = now
+            save_hero_quest(hero_quest, batch)
+            quests = getattr(hero, 'active_quests', None)
+            if quests and hero_quest in quests:
+                quests.remove(hero_quest)
+        elif kind == QUEST_STARTED:
+            active = effect[1]
+            hero_quest = active.ref = HeroQuest(
+                hero=hero, quest=active.quest, status='in_progress', started_at=now,
+            )
+            if batch is None:
+                hero_quest.save()
+            else:
+                batch.add_hero_quest(hero_quest)
+                # Следующий ход в этом же пакете должен увидеть новый квест
+                hero.active_quests = [hero_quest]
+            quest_catalog.mark_started(hero.pk, active.quest.pk)
+        elif kind == ITEM_FOUND:
+            _add_item(hero, effect[1], batch)
+        elif kind == NOTIFICATION:
+            _, title, message, notification_type = effect
+            send_hero_notification(hero, title=title, message=message, notification_type=notification_type)
+
+    if before is None or state.stats() != before:
+        save_hero(hero, batch)
+
+def _add_item(hero: Hero, item, batch: TickBatch = None):
+    """Кладет предмет в инвентарь героя (+1 к количеству)."""
+    if batch is not None:
+        # Запись в инвентарь произойдет при сбросе пакета
+        batch.add_item(hero, item)
+        return
+    inventory_item, created = Inventory.objects.get_or_create(
+        hero=hero,
+        item=item,
+        defaults={'quantity': 1}
+    )
+    if not created:
+        inventory_item.quantity += 1
+        inventory_item.save()
@@ -0,0 +1,105 @@
+# game_engine/scheduler.py
+"""
+Расписание ходов героев.
+Каждый герой хранит время следующего хода (Hero.next_action_at, с индексом),
+и тик выбирает только тех, чей ход уже наступил.
+Перед обработкой героев "захватывают": next_action_at переносится на время
+аренды, поэтому пересекающийся тик или догоняющая симуляция их уже не выберут.
+Если обработка упала, герой снова станет доступен по истечении аренды.
+"""
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from heroes.models import Hero
+
+# Интервал между ходами в секундах в зависимости от состояния героя
+HERO_TURN_INTERVALS = getattr(settings, 'HERO_TURN_INTERVALS', {
+    'fight': 60,       # Бой - раунд каждую минуту
+    'adventure': 600,
+    'quest': 600,
+    'rest': 900,       # Отдых - реже
+})
+DEFAULT_TURN_INTERVAL = 600
+
+# Ленивый режим: регулярный тик обрабатывает только героев активных игроков,
+# остальные догоняют пропущенные ходы при просмотре или редкой "подметкой"
+HERO_LAZY_SIMULATION = getattr(settings, 'HERO_LAZY_SIMULATION', False)
+# Сколько дней после последнего входа игрок считается активным
+HERO_LAZY_ACTIVE_DAYS = getattr(settings, 'HERO_LAZY_ACTIVE_DAYS', 3)
+# Максимум ходов, которые догоняются за один раз (144 хода по 10 минут = сутки)
+HERO_CATCH_UP_MAX_TURNS = getattr(settings, 'HERO_CATCH_UP_MAX_TURNS', 144)
+# На сколько секунд захваченный герой исключается из выборки (аренда)
+HERO_TURN_LEASE_SECONDS = getattr(settings, 'HERO_TURN_LEASE_SECONDS', 300)
+
+def next_action_time(hero: Hero, now=None):
+    """
+    Возвращает время следующего хода героя или None, если ходить не нужно.
+    """
+    if hero.state == 'dead':
+        return None
+    now = now or timezone.now()
+    interval = HERO_TURN_INTERVALS.get(hero.state, DEFAULT_TURN_INTERVAL)
+    return now + timedelta(seconds=interval)
+
+def schedule_next_action(hero: Hero, now=None):
+    """Назначает герою время следующего хода (без сохранения)."""
+    hero.next_action_at = next_action_time(hero, now)
+
+def due_heroes(queryset=None, now=None):
+    """
+    Герои, чей ход уже наступил. Использует индекс по next_action_at.
+    """
+    if queryset is None:
+        queryset = Hero.objects.all()
+    return queryset.filter(next_action_at__lte=now or timezone.now())
+
+def _lease_until(now):
+    # Случайные микросекунды отличают аренды разных процессов, взятые в одно время
+    return now + timedelta(seconds=HERO_TURN_LEASE_SECONDS, microseconds=random.randrange(1000000))
+
+def claim_heroes(heroes, now=None):
+    """
+    Захватывает пачку героев, чей ход наступил: один UPDATE переносит их
+    next_action_at на время аренды, второй запрос узнает, какие строки
+    достались этому процессу. Возвращает захваченных героев (в памяти у них
+    остается прежнее next_action_at).
+    """
+    if not heroes:
+        return []
+    now = now or timezone.now()
+    lease = _lease_until(now)
+    hero_ids = [hero.pk for hero in heroes]
+    Hero.objects.filter(pk__in=hero_ids, next_action_at__lte=now).update(next_action_at=lease)
+    claimed = set(Hero.objects.filter(pk__in=hero_ids, next_action_at=lease).values_list('pk', flat=True))
+    return [hero for hero in heroes if hero.pk in claimed]
+
+def claim_hero(hero: Hero, now=None):
+    """
+    Захватывает одного героя условным UPDATE по загруженному next_action_at.
+    False - героя уже захватил или обработал другой процесс.
+    """
+    now = now or timezone.now()
+    if hero.next_action_at is None or hero.next_action_at > now:
+        return False
+    return bool(Hero.objects.filter(pk=hero.pk, next_action_at=hero.next_action_at).update(
+        next_action_at=_lease_until(now),
+    ))
+
+def _active_since(now=None):
+    return (now or timezone.now()) - timedelta(days=HERO_LAZY_ACTIVE_DAYS)
+
+def tick_heroes(queryset=None, now=None):
+    """
+    Герои для регулярного тика: все, чей ход наступил,
+    а в ленивом режиме - только герои недавно заходивших игроков.
+    """
+    queryset = due_heroes(queryset, now)
+    if HERO_LAZY_SIMULATION:
+        queryset = queryset.filter(owner__last_login__gte=_active_since(now))
+    return queryset
+
+def idle_due_heroes(queryset=None, now=None):
+    """Герои неактивных игроков, которые ждут догоняющей симуляции."""
+    queryset = due_heroes(queryset, now)
+    return queryset.exclude(owner__last_login__gte=_active_since(now))
@@ -2,39 +2,252 @@
 """
 Celery задачи для периодического запуска игровых процессов.
 """
-from celery import shared_task
+from celery import shared_task, group, chord
 from django.core.cache import cache
 from django.conf import settings
+from django.db.models import Prefetch
 from .engine import engine
+from .batch import TickBatch
+from .combat import resolve_fights
+from .catalog import quest_catalog
+from .scheduler import tick_heroes, idle_due_heroes, schedule_next_action, claim_heroes
+from .metrics import TickMetrics, hero_branch
+from .persistence import active_quest
+from .world import current_modifiers
 from heroes.models import Hero
+from heroes.journal import append_entries
+from heroes.realtime import capture, publish_changes
+from events.models import HeroQuest
+from accounts.services import buffered_notifications
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Размер пачки героев, которая обрабатывается и сбрасывается в БД за раз
+HERO_TICK_CHUNK_SIZE = getattr(settings, 'HERO_TICK_CHUNK_SIZE', 500)
+# Сколько героев получает один шард (одна подзадача Celery)
+HERO_TICK_SHARD_SIZE = getattr(settings, 'HERO_TICK_SHARD_SIZE', 5000)
+
+def _tick_queryset():
+    """
+    Герои для тика вместе с экипировкой (её бонусы хранятся в самой строке)
+    и активными квестами (одним запросом на пачку).
+    """
+    return Hero.objects.order_by('pk').select_related('equipment').prefetch_related(
+        Prefetch(
+            'quests',
+            queryset=HeroQuest.objects.filter(status='in_progress').select_related('quest').order_by('pk'),
+            to_attr='active_quests',
+        )
+    )
+
+def _iter_hero_chunks(queryset, chunk_size, claim=True):
+    """
+    Отдает героев пачками по chunk_size, постранично по первичному ключу.
+    С claim=True каждая пачка захватывается (scheduler.claim_heroes): героев,
+    которых уже обрабатывает другой тик, в пачке не будет.
+    """
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        last_pk = chunk[-1].pk
+        if claim:
+            chunk = claim_heroes(chunk)
+            if not chunk:
+                continue
+        yield chunk
+
+def _process_hero_chunk(heroes, logs, metrics=None):
+    """
+    Обрабатывает пачку героев и сбрасывает изменения одной транзакцией.
+    Бои всех сражающихся героев пачки считаются одним векторным проходом,
+    уведомления записываются одной пачкой в конце.
+    Мировые модификаторы читаются один раз на пачку.
+    """
+    metrics = metrics or TickMetrics(enabled=False)
+    batch = TickBatch(metrics)
+    with metrics.track_cache():
+        modifiers = current_modifiers()
+    hero_ids = [hero.pk for hero in heroes]
+    journal_entries = []
+    before = {hero.pk: capture(hero) for hero in heroes}
+    quest_catalog.prime_started(hero_ids)
+    try:
+        with buffered_notifications():
+            fighters = [
+                hero for hero in heroes
+                if hero.state == 'fight' and active_quest(hero) is None
+            ]
+            started_at = time.perf_counter()
+            fight_logs = resolve_fights(fighters, batch, modifiers=modifiers)
+            if fighters:
+                # Бой считается векторно - каждому бойцу записываем среднее время
+                fight_seconds = (time.perf_counter() - started_at) / len(fighters)
+                for hero in fighters:
+                    metrics.record_turn(hero, 'fight', fight_seconds)
+            for hero in heroes:
+                if hero.pk in fight_logs:
+                    log_entry = fight_logs[hero.pk]
+                else:
+                    branch = hero_branch(hero)
+                    found_count = len(batch.found_items)
+                    started_at = time.perf_counter()
+                    log_entry = engine.process_hero_turn(hero, batch, modifiers=modifiers)
+                    seconds = time.perf_counter() - started_at
+                    if len(batch.found_items) > found_count:
+                        branch = 'loot'
+                    metrics.record_turn(hero, branch, seconds)
+                # Следующий ход зависит от нового состояния героя
+                schedule_next_action(hero)
+                batch.save_hero(hero)
+                logs.append(f"{hero.name}: {log_entry}")
+                journal_entries.append((hero.id, log_entry))
+            batch.flush()
+    finally:
+        quest_catalog.forget_started(hero_ids)
+    # Журналы и дельты всей пачки пишутся в Redis пачками
+    with metrics.track_cache():
+        append_entries(journal_entries)
+    with metrics.track_cache():
+        publish_changes(
+            (hero, before[hero.pk], log_entry)
+            for hero, (_, log_entry) in zip(heroes, journal_entries)
+        )
+    return len(heroes)
+
+def _hero_shard_ranges(queryset, shard_size):
+    """
+    Делит героев на диапазоны id примерно по shard_size героев в каждом.
+    Читаются только первичные ключи, так что это дешевле самого тика.
+    """
+    ranges = []
+    first_pk = last_pk = None
+    count = 0
+    for pk in queryset.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=shard_size):
+        if first_pk is None:
+            first_pk = pk
+        last_pk = pk
+        count += 1
+        if count == shard_size:
+            ranges.append((first_pk, last_pk))
+            first_pk = None
+            count = 0
+    if first_pk is not None:
+        ranges.append((first_pk, last_pk))
+    return ranges
+
 @shared_task
 def process_all_heroes():
     """
-    Асинхронная задача: обрабатывает ходы всех героев.
+    Асинхронная задача-координатор: делит героев, чей ход наступил, на шарды
+    по диапазонам id и раздает их воркерам. Итог собирает finalize_hero_tick.
     """
     logger.info("Начало обработки всех героев...")
+    started_at = time.time()
+    ranges = _hero_shard_ranges(tick_heroes(), HERO_TICK_SHARD_SIZE)
+    if not ranges:
+        logger.info("Нет героев для обработки.")
+        return "Обработано 0 героев."
+
+    shards = group(process_hero_shard.s(first_pk, last_pk) for first_pk, last_pk in ranges)
+    chord(shards)(finalize_hero_tick.s(started_at))
+    logger.info(f"Тик разбит на {len(ranges)} шардов.")
+    return f"Запущено {len(ranges)} шардов."
+
+@shared_task
+def process_hero_shard(first_pk, last_pk):
+    """
+    Обрабатывает героев с наступившим ходом и id в диапазоне [first_pk, last_pk].
+    Каждый шард читает своих героев собственными запросами на своем воркере.
+    """
+    started_at = time.time()
     processed_count = 0
     logs = []
-    for hero in Hero.objects.all():
-        log_entry = engine.process_hero_turn(hero)
-        logs.append(f"{hero.name}: {log_entry}")
-        # Здесь можно сохранить лог в БД или кэш для отображения игроку
-        cache.set(f"hero_log_{hero.id}", log_entry, timeout=3600) # Кэшируем на 1 час
-        processed_count += 1
-        
-    logger.info(f"Обработано {processed_count} героев.")
+    metrics = TickMetrics()
+    queryset = tick_heroes(_tick_queryset().filter(pk__gte=first_pk, pk__lte=last_pk))
+    with metrics.track_db():
+        for heroes in _iter_hero_chunks(queryset, HERO_TICK_CHUNK_SIZE):
+            processed_count += _process_hero_chunk(heroes, logs, metrics)
+    return {
+        'first_pk': first_pk,
+        'last_pk': last_pk,
+        'processed': processed_count,
+        'seconds': time.time() - started_at,
+        'metrics': metrics.as_dict() if metrics.enabled else None,
+    }
+
+@shared_task
+def finalize_hero_tick(results, started_at):
+    """
+    Callback тика: суммирует результаты шардов и сохраняет сводку в кэш.
+    Сводка с метриками доступна персоналу по адресу game_engine:tick_metrics.
+    """
+    processed_count = sum(result['processed'] for result in results)
+    summary = {
+        'processed': processed_count,
+        'shards': len(results),
+        'seconds': time.time() - started_at,
+        'slowest_shard_seconds': max((result['seconds'] for result in results), default=0),
+        'finished_at': time.time(),
+    }
+    shard_metrics = [result.get('metrics') for result in results]
+    if any(shard_metrics):
+        summary['metrics'] = TickMetrics.merge(shard_metrics).summary()
+    cache.set("hero_tick_summary", summary, timeout=7200)
+    metrics = summary.get('metrics', {})
+    logger.info(
+        f"Обработано {processed_count} героев в {summary['shards']} шардах "
+        f"за {summary['seconds']:.1f} с.",
+        extra={
+            'tick_processed': processed_count,
+            'tick_seconds': summary['seconds'],
+            'tick_db_queries': metrics.get('db_queries'),
+            'tick_cache_round_trips': metrics.get('cache_round_trips'),
+        },
+    )
     return f"Обработано {processed_count} героев."
 
 @shared_task
-def run_global_events():
+def catch_up_idle_heroes():
+    """
+    Редкая "подметка" для ленивого режима: догоняет ходы героев
+    неактивных игроков, пачками и с одной записью на пачку.
+    """
+    processed_count = 0
+    for heroes in _iter_hero_chunks(idle_due_heroes(_tick_queryset()), HERO_TICK_CHUNK_SIZE):
+        batch = TickBatch()
+        modifiers = current_modifiers()
+        hero_ids = [hero.pk for hero in heroes]
+        journal_entries = []
+        changes = []
+        quest_catalog.prime_started(hero_ids)
+        try:
+            with buffered_notifications():
+                for hero in heroes:
+                    before = capture(hero)
+                    logs = engine.catch_up(hero, batch=batch, modifiers=modifiers, claimed=True)
+                    journal_entries.extend((hero.id, log_entry) for log_entry in logs)
+                    if logs:
+                        changes.append((hero, before, logs[-1]))
+                batch.flush()
+        finally:
+            quest_catalog.forget_started(hero_ids)
+        append_entries(journal_entries)
+        publish_changes(changes)
+        processed_count += len(heroes)
+    logger.info(f"Догнали ходы {processed_count} неактивных героев.")
+    return f"Догнали ходы {processed_count} героев."
+
+@shared_task
+def run_global_events(event_id=None):
     """
-    Асинхронная задача: запускает глобальные события.
+    Асинхронная задача: запускает глобальное событие (случайное или event_id
+    из game_engine.world.WORLD_EVENTS).
     """
-    event_log = engine.run_global_events()
+    event_log = engine.run_global_events(event_id)
     # Можно кэшировать или отправлять уведомления
     cache.set("global_event_log", event_log, timeout=7200) # Кэшируем на 2 часа
     logger.info(f"Глобальное событие: {event_log}")
@@ -46,9 +259,9 @@ from celery.schedules import crontab
 # В settings.py или отдельном файле celery.py нужно настроить beat_schedule
 # Например:
 # CELERY_BEAT_SCHEDULE = {
-#     'process-heroes-every-10-mins': {
+#     'process-due-heroes-every-minute': {
 #         'task': 'game_engine.tasks.process_all_heroes',
-#         'schedule': 600.0, # 600 секунд = 10 минут
+#         'schedule': 60.0, # Каждую минуту берем только героев, чей ход наступил
 #     },
 #     'run-global-events-hourly': {
 #         'task': 'game_engine.tasks.run_global_events',
@@ -0,0 +1,30 @@
+# game_engine/tests.py (новый файл)
+"""
+Бюджеты SQL-запросов движка (game_engine.benchmark) на небольшой выборке героев:
+появившийся N+1 в ходе героя или в сбросе пачки валит тесты.
+Как и замер, тест пишет в Redis из CACHES - нужна отдельная (не рабочая) база Redis.
+"""
+from django.test import TestCase
+from game_engine import benchmark
+from game_engine.tasks import _tick_queryset, HERO_TICK_CHUNK_SIZE
+
+# Героев в выборке: несколько пачек тика, чтобы запросы на пачку делились на героев, как в работе
+BUDGET_TEST_HEROES = 1000
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed(BUDGET_TEST_HEROES)
+
+    def test_branch_query_budgets(self):
+        branches = benchmark.measure_branches(list(_tick_queryset()[:HERO_TICK_CHUNK_SIZE]))
+        for branch in ('fight', 'rest', 'quest', 'adventure'):
+            self.assertIn(branch, branches)
+        benchmark.check_budgets(branches, (0, 0.0, 0))
+
+    def test_tick_query_budget(self):
+        tick = benchmark.measure_tick()
+        self.assertEqual(tick[0], BUDGET_TEST_HEROES)
+        benchmark.check_budgets({}, tick)
@@ -0,0 +1,8 @@
+# game_engine/urls.py (новый файл)
+from django.urls import path
+from . import views
+
+app_name = 'game_engine'
+urlpatterns = [
+    path('metrics/', views.tick_metrics, name='tick_metrics'),
+]
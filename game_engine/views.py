@@ -0,0 +1,15 @@
+# game_engine/views.py (новый файл)
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import JsonResponse
+
+@staff_member_required
+def tick_metrics(request):
+    """
+    Сводка последнего тика с метриками (см. game_engine.metrics) в JSON.
+    Доступна только персоналу.
+    """
+    summary = cache.get("hero_tick_summary")
+    if summary is None:
+        return JsonResponse({'error': 'Тик еще не завершался'}, status=404)
+    return JsonResponse(summary)
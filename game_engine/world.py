@@ -0,0 +1,153 @@
+# game_engine/world.py (новый файл)
+"""
+Мировые события.
+Событие описывается декларативно: мгновенные эффекты (лечение или урон,
+золото) и модификаторы на время (множитель опыта, множители весов действий,
+например шанса встретить монстра).
+Мгновенные эффекты - один UPDATE по всем подходящим героям, без перебора
+героев в Python; после него меняется эпоха снимков героев
+(heroes.snapshots), чтобы страницы не показывали старые значения.
+Модификаторы на время хранятся в кэше списком (id события, до когда)
+и читаются тиком один раз на пачку героев (current_modifiers).
+
+Новое событие:
+
+    register_world_event('eclipse', "Затмение! Монстры повсюду.",
+                         action_weights={'meet_monster': 4}, duration=1800)
+"""
+import random
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Value, IntegerField
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+from heroes.models import Hero
+from heroes.snapshots import bump_snapshot_epoch
+from .core import WorldModifiers, NO_MODIFIERS
+
+WORLD_MODIFIERS_KEY = "world_modifiers"
+# Сколько действует событие с модификаторами, если длительность не указана (секунды)
+WORLD_EVENT_DURATION = getattr(settings, 'WORLD_EVENT_DURATION', 3600)
+
+# id -> WorldEvent, в порядке регистрации
+WORLD_EVENTS = {}
+
+
+class WorldEvent:
+    """Описание мирового события."""
+    __slots__ = ('id', 'message', 'heal', 'gold', 'states', 'xp_multiplier', 'action_weights', 'duration')
+
+    def __init__(self, event_id, message, heal=0, gold=0, states=None,
+                 xp_multiplier=1.0, action_weights=None, duration=None):
+        self.id = event_id
+        self.message = message
+        self.heal = heal                    # Мгновенно: +здоровье (или урон, если < 0; не ниже 1)
+        self.gold = gold                    # Мгновенно: +золото
+        self.states = states                # Кого касаются мгновенные эффекты (None - всех живых)
+        self.xp_multiplier = xp_multiplier  # На время: множитель опыта
+        self.action_weights = tuple(sorted((action_weights or {}).items())) # На время: множители весов действий
+        self.duration = duration if duration is not None else WORLD_EVENT_DURATION
+
+    @property
+    def is_instant(self):
+        return bool(self.heal or self.gold)
+
+    @property
+    def has_modifiers(self):
+        return self.xp_multiplier != 1 or bool(self.action_weights)
+
+
+def register_world_event(event_id, message, **options):
+    """Регистрирует (или заменяет) мировое событие."""
+    event = WORLD_EVENTS[event_id] = WorldEvent(event_id, message, **options)
+    return event
+
+
+def apply_instant_effects(event: WorldEvent):
+    """
+    Применяет мгновенные эффекты события одним UPDATE.
+    Мертвые герои не затрагиваются. Возвращает число измененных героев.
+    """
+    if not event.is_instant:
+        return 0
+    updates = {'updated_at': timezone.now()}
+    if event.heal:
+        updates['health'] = Greatest(
+            Least(F('health') + event.heal, F('max_health'), output_field=IntegerField()),
+            Value(1), output_field=IntegerField(),
+        )
+    if event.gold:
+        updates['gold'] = F('gold') + event.gold
+    heroes = Hero.objects.exclude(state='dead')
+    if event.states:
+        heroes = heroes.filter(state__in=event.states)
+    changed = heroes.update(**updates)
+    # UPDATE не вызывает сигналы - снимки героев устаревают все сразу
+    bump_snapshot_epoch()
+    return changed
+
+
+def _active_entries(now):
+    """Действующие события из кэша: [(id события, до когда)]."""
+    return [
+        (event_id, expires_at)
+        for event_id, expires_at in cache.get(WORLD_MODIFIERS_KEY) or ()
+        if expires_at > now
+    ]
+
+
+def start_modifiers(event: WorldEvent, now=None):
+    """Включает модификаторы события на event.duration секунд."""
+    if not event.has_modifiers:
+        return
+    now = now or time.time()
+    entries = [entry for entry in _active_entries(now) if entry[0] != event.id]
+    entries.append((event.id, now + event.duration))
+    timeout = max(expires_at for _, expires_at in entries) - now
+    cache.set(WORLD_MODIFIERS_KEY, entries, timeout=int(timeout) + 1)
+
+
+def current_modifiers(now=None):
+    """
+    Действующие модификаторы всех активных событий (одно чтение из кэша).
+    Множители опыта и весов действий разных событий перемножаются.
+    """
+    entries = _active_entries(now or time.time())
+    if not entries:
+        return NO_MODIFIERS
+    xp_multiplier = 1.0
+    action_weights = {}
+    for event_id, _ in entries:
+        event = WORLD_EVENTS.get(event_id)
+        if event is None:
+            continue
+        xp_multiplier *= event.xp_multiplier
+        for action_id, multiplier in event.action_weights:
+            action_weights[action_id] = action_weights.get(action_id, 1) * multiplier
+    return WorldModifiers(xp_multiplier, tuple(sorted(action_weights.items())))
+
+
+def run_world_event(event_id=None, rng=random):
+    """
+    Запускает событие (по id или случайное): мгновенные эффекты и модификаторы.
+    Возвращает (событие, число героев, затронутых мгновенными эффектами).
+    """
+    event = WORLD_EVENTS[event_id] if event_id else rng.choice(list(WORLD_EVENTS.values()))
+    changed = apply_instant_effects(event)
+    start_modifiers(event)
+    return event, changed
+
+
+# --- Встроенные события ---
+
+register_world_event('spring', "В мире наступает весна! Все герои чувствуют прилив сил.", heal=25)
+register_world_event('quest_contest', "Объявлен конкурс на лучший квест! Участники получают бонус к опыту.",
+                     xp_multiplier=1.5)
+register_world_event('monster_surge', "Наблюдается повышенная активность монстров. Осторожнее в путешествиях!",
+                     action_weights={'meet_monster': 3})
+register_world_event('relic_rumors', "В тавернах появляются слухи о реликтовом артефакте.",
+                     action_weights={'artifact': 2})
+register_world_event('storm', "Штормовое предупреждение! Герои в дороге должны быть особенно осторожны.",
+                     heal=-10, states=('adventure',))
+register_world_event('new_year', "С Новогодвиллем! В воздухе витает праздничное настроение.", gold=20)
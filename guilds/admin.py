@@ -8,7 +8,8 @@ class GuildAdmin(admin.ModelAdmin):
     list_filter = ('is_public', 'level', 'created_at')
     search_fields = ('name', 'description', 'motto')
     prepopulated_fields = {"slug": ("name",)} # Автозаполнение slug из name
-    readonly_fields = ('created_at', 'updated_at')
+    # Счетчики меняются только атомарно (Guild.save их не записывает)
+    readonly_fields = ('members_count', 'level', 'experience', 'gold_donated', 'created_at', 'updated_at')
 
 @admin.register(GuildMembership)
 class GuildMembershipAdmin(admin.ModelAdmin):
@@ -16,6 +17,18 @@ class GuildMembershipAdmin(admin.ModelAdmin):
     list_filter = ('role', 'guild', 'joined_at')
     search_fields = ('hero__name', 'guild__name')
 
+    # Удаление через Guild.remove_members - чтобы счетчик участников гильдии
+    # уменьшился одним UPDATE на гильдию
+    def delete_model(self, request, obj):
+        obj.guild.remove_members([obj.hero_id])
+
+    def delete_queryset(self, request, queryset):
+        by_guild = {}
+        for guild_id, hero_id in queryset.values_list('guild_id', 'hero_id'):
+            by_guild.setdefault(guild_id, []).append(hero_id)
+        for guild in Guild.objects.filter(pk__in=by_guild):
+            guild.remove_members(by_guild[guild.pk])
+
 @admin.register(GuildInvitation)
 class GuildInvitationAdmin(admin.ModelAdmin):
     list_display = ('invited_hero', 'guild', 'invited_by', 'is_accepted', 'is_declined', 'created_at')
@@ -0,0 +1,132 @@
+# guilds/contributions.py (новый файл)
+"""
+Буфер вкладов в гильдию.
+Вклад опыта или золота не пишет строку Guild (общую для всех участников
+и потому "горячую"), а прибавляется счетчиками HINCRBY в хэш Redis -
+без блокировок в БД. Задача guilds.tasks.fold_guild_contributions раз в
+минуту переносит накопленное в Guild и GuildMembership одной транзакцией
+и повышает уровень гильдий. Перенос идет под блокировкой, а id каждой
+примененной пачки записывается в БД в той же транзакции (GuildContributionFold),
+поэтому повторный или параллельный перенос не удваивает вклады.
+"""
+import uuid
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+PENDING_KEY = "guild_contributions"
+# Переносимые пачки: хэш пачки называется по её id, а id незавершенных
+# пачек лежат в множестве - их заберет следующий перенос
+FOLD_KEY_PREFIX = "guild_contributions:fold:"
+FOLDS_KEY = "guild_contributions:folds"
+# Блокировка переноса (SET NX EX): одновременно работает только один перенос
+FOLD_LOCK_KEY = "guild_contributions:lock"
+FOLD_LOCK_TIMEOUT = 300
+# Сколько хранить записи о примененных пачках (нужны, пока пачка может быть в Redis)
+FOLD_RECORD_DAYS = 7
+KINDS = ('experience', 'gold')
+
+def buffer_contribution(membership, experience=0, gold=0):
+    """Откладывает вклад участника и его гильдии (один обмен с Redis)."""
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for kind, amount in (('experience', experience), ('gold', gold)):
+        if amount:
+            pipe.hincrby(PENDING_KEY, f"g:{membership.guild_id}:{kind}", amount)
+            pipe.hincrby(PENDING_KEY, f"m:{membership.pk}:{kind}", amount)
+    pipe.execute()
+
+def _take_pending(connection):
+    """
+    Забирает накопленные вклады в новую пачку с уникальным id: хэш
+    переименовывается, так что новые вклады копятся в новом хэше.
+    Возвращает id всех непримененных пачек (вместе с оставшимися от упавших переносов).
+    """
+    if connection.exists(PENDING_KEY):
+        fold_id = uuid.uuid4().hex
+        pipe = connection.pipeline()
+        pipe.rename(PENDING_KEY, FOLD_KEY_PREFIX + fold_id)
+        pipe.sadd(FOLDS_KEY, fold_id)
+        pipe.execute()
+    return sorted(fold_id.decode() for fold_id in connection.smembers(FOLDS_KEY))
+
+def _read_fold(connection, fold_id):
+    """Суммы пачки: ({id гильдии: {вид: сумма}}, {id членства: {вид: сумма}})."""
+    guilds, memberships = {}, {}
+    for field, amount in connection.hgetall(FOLD_KEY_PREFIX + fold_id).items():
+        scope, object_id, kind = field.decode().split(':')
+        target = guilds if scope == 'g' else memberships
+        target.setdefault(int(object_id), dict.fromkeys(KINDS, 0))[kind] += int(amount)
+    return guilds, memberships
+
+def _apply_fold(fold_id, guild_amounts, membership_amounts):
+    """
+    Применяет пачку одной транзакцией вместе с записью GuildContributionFold.
+    Уже примененная пачка (запись есть) пропускается - повтор после падения
+    между фиксацией и удалением хэша ничего не удвоит.
+    Возвращает (измененные гильдии, число повышений уровня).
+    """
+    from .models import Guild, GuildMembership, GuildContributionFold
+    now = timezone.now()
+    level_ups = 0
+    with transaction.atomic():
+        _, created = GuildContributionFold.objects.get_or_create(fold_id=fold_id)
+        if not created:
+            return [], 0
+        guilds = list(Guild.objects.select_for_update().filter(pk__in=guild_amounts).order_by('pk'))
+        for guild in guilds:
+            amounts = guild_amounts[guild.pk]
+            guild.experience += amounts['experience']
+            guild.gold_donated += amounts['gold']
+            guild.updated_at = now
+            level_ups += guild.check_level_up()
+        Guild.objects.bulk_update(guilds, ['level', 'experience', 'gold_donated', 'updated_at'])
+
+        memberships = []
+        for membership_id, amounts in membership_amounts.items():
+            membership = GuildMembership(pk=membership_id)
+            membership.experience_contributed = F('experience_contributed') + amounts['experience']
+            membership.gold_contributed = F('gold_contributed') + amounts['gold']
+            membership.updated_at = now
+            memberships.append(membership)
+        GuildMembership.objects.bulk_update(memberships, ['experience_contributed', 'gold_contributed', 'updated_at'])
+    return guilds, level_ups
+
+def fold_contributions():
+    """
+    Переносит отложенные вклады в БД и повышает уровни гильдий.
+    Работает под блокировкой в Redis (параллельный запуск сразу выходит),
+    каждая пачка применяется не больше одного раза.
+    Строки гильдий блокируются по порядку id на время одной транзакции.
+    Возвращает (число гильдий, число повышений уровня).
+    """
+    from .leaderboards import update_guilds
+    connection = get_redis_connection("default")
+    lock = connection.lock(FOLD_LOCK_KEY, timeout=FOLD_LOCK_TIMEOUT, blocking=False)
+    if not lock.acquire():
+        return 0, 0
+    try:
+        touched = {}
+        level_ups = 0
+        for fold_id in _take_pending(connection):
+            guilds, fold_level_ups = _apply_fold(fold_id, *_read_fold(connection, fold_id))
+            pipe = connection.pipeline()
+            pipe.delete(FOLD_KEY_PREFIX + fold_id)
+            pipe.srem(FOLDS_KEY, fold_id)
+            pipe.execute()
+            touched.update((guild.pk, guild) for guild in guilds)
+            level_ups += fold_level_ups
+    finally:
+        lock.release()
+    # bulk_update не вызывает сигналы - обновляем рейтинги сами
+    update_guilds(touched.values())
+    return len(touched), level_ups
+
+def prune_fold_records():
+    """Удаляет старые записи о примененных пачках. Возвращает число удаленных."""
+    from .models import GuildContributionFold
+    deleted, _ = GuildContributionFold.objects.filter(
+        folded_at__lt=timezone.now() - timedelta(days=FOLD_RECORD_DAYS),
+    ).delete()
+    return deleted
@@ -0,0 +1,63 @@
+# guilds/leaderboards.py (новый файл)
+"""
+Рейтинги гильдий в Redis: по уровню и опыту, по пожертвованному золоту
+и по числу участников. Обновляются сигналами Guild при каждом сохранении,
+раз в сутки сверяются с БД (guilds.tasks.reconcile_guild_leaderboards).
+"""
+from django_redis import get_redis_connection
+from divine_heroes.leaderboards import RedisLeaderboard, composite_score, rebuild_leaderboards
+
+GUILD_LEADERBOARDS = {
+    'level': RedisLeaderboard('guilds:level'),     # Уровень, затем опыт
+    'gold': RedisLeaderboard('guilds:gold'),       # Пожертвовано золота
+    'members': RedisLeaderboard('guilds:members'), # Количество участников
+}
+
+def guild_scores(level, experience, gold_donated, members_count):
+    """Счета гильдии по каждому рейтингу."""
+    return {
+        'level': composite_score(level, experience),
+        'gold': gold_donated,
+        'members': members_count,
+    }
+
+def update_guild(guild):
+    """Записывает текущие значения гильдии во все рейтинги."""
+    update_guilds([guild])
+
+def update_guilds(guilds):
+    """Записывает текущие значения гильдий во все рейтинги за один обмен с Redis."""
+    scores = {board: {} for board in GUILD_LEADERBOARDS}
+    for guild in guilds:
+        for board, score in guild_scores(guild.level, guild.experience, guild.gold_donated, guild.members_count).items():
+            scores[board][guild.pk] = score
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for board, board_scores in scores.items():
+        GUILD_LEADERBOARDS[board].set_scores(board_scores, pipe=pipe)
+    pipe.execute()
+
+def remove_guild(guild_id):
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for leaderboard in GUILD_LEADERBOARDS.values():
+        leaderboard.remove(guild_id, pipe=pipe)
+    pipe.execute()
+
+def top_guilds(board='level', count=10, offset=0):
+    """Страница рейтинга: [(место, гильдия)] - один запрос к БД за гильдиями страницы."""
+    from .models import Guild
+    rows = GUILD_LEADERBOARDS[board].top(count, offset)
+    guilds = Guild.objects.in_bulk([guild_id for _, guild_id, _ in rows])
+    return [(rank, guilds[guild_id]) for rank, guild_id, _ in rows if guild_id in guilds]
+
+def guild_rank(guild_id, board='level'):
+    """Место гильдии в рейтинге (с 1) или None."""
+    return GUILD_LEADERBOARDS[board].rank(guild_id)
+
+def rebuild_guild_leaderboards():
+    """Пересобирает все рейтинги гильдий из БД за один проход. Возвращает число гильдий."""
+    from .models import Guild
+    rows = Guild.objects.values_list('pk', 'level', 'experience', 'gold_donated', 'members_count')
+    return rebuild_leaderboards(GUILD_LEADERBOARDS, (
+        (pk, guild_scores(level, experience, gold, members))
+        for pk, level, experience, gold, members in rows.iterator(chunk_size=2000)
+    ))
@@ -1,11 +1,19 @@
 # guilds/models.py (новый файл)
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.utils import timezone # Добавлено
 import uuid
+from django.conf import settings
 from heroes.models import Hero
 
+# Опыта для перехода гильдии на следующий уровень: уровень * GUILD_LEVEL_EXPERIENCE
+GUILD_LEVEL_EXPERIENCE = getattr(settings, 'GUILD_LEVEL_EXPERIENCE', 1000)
+# Счетчики гильдии, которые меняются только атомарными UPDATE (вступления и выходы,
+# перенос вкладов) - Guild.save их не перезаписывает
+GUILD_COUNTER_FIELDS = ('members_count', 'level', 'experience', 'gold_donated')
+
 class Guild(models.Model):
     """
     Модель гильдии.
@@ -27,7 +35,8 @@ class Guild(models.Model):
     invitation_code = models.CharField(max_length=50, blank=True, verbose_name="Код приглашения")
     
     # Статистика
-    members_count = models.PositiveIntegerField(default=1, verbose_name="Количество участников")
+    # Число членств (GuildMembership); основатель считается, только когда вступит
+    members_count = models.PositiveIntegerField(default=0, verbose_name="Количество участников")
     level = models.PositiveIntegerField(default=1, verbose_name="Уровень гильдии")
     experience = models.PositiveIntegerField(default=0, verbose_name="Опыт гильдии")
     gold_donated = models.PositiveIntegerField(default=0, verbose_name="Пожертвовано золота")
@@ -50,25 +59,76 @@ class Guild(models.Model):
         # Если лидер не назначен, назначаем основателя
         if not self.leader and self.founder:
             self.leader = self.founder
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            # Значения счетчиков в памяти могли устареть - не затираем параллельные UPDATE
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in GUILD_COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
 
+    def check_level_up(self):
+        """
+        Повышает уровень, пока хватает опыта (опыт тратится, как у героя).
+        Ничего не сохраняет. Возвращает число полученных уровней.
+        """
+        levels = 0
+        while self.experience >= self.level * GUILD_LEVEL_EXPERIENCE:
+            self.experience -= self.level * GUILD_LEVEL_EXPERIENCE
+            self.level += 1
+            levels += 1
+        return levels
+
     def add_member(self, hero: Hero):
         """Добавляет героя в гильдию."""
-        membership, created = GuildMembership.objects.get_or_create(
-            guild=self,
-            hero=hero,
-            defaults={'role': 'member'}
-        )
-        if created:
-            self.members_count = self.guild_memberships.count() # Обновляем счетчик
-            self.save()
+        with transaction.atomic():
+            membership, created = GuildMembership.objects.get_or_create(
+                guild=self,
+                hero_id=hero.pk,
+                defaults={'role': 'member'}
+            )
+            if created:
+                self._change_members_count(1)
         return membership
 
     def remove_member(self, hero: Hero):
         """Удаляет героя из гильдии."""
-        GuildMembership.objects.filter(guild=self, hero=hero).delete()
-        self.members_count = self.guild_memberships.count() # Обновляем счетчик
-        self.save()
+        self.remove_members([hero])
+
+    def add_members(self, heroes):
+        """
+        Добавляет пачку героев (слияние гильдий, админка): одна вставка и одно
+        обновление строки гильдии. Герои, уже состоящие в какой-либо гильдии,
+        пропускаются. Возвращает созданные членства.
+        """
+        hero_ids = {hero.pk for hero in heroes}
+        with transaction.atomic():
+            taken = set(GuildMembership.objects.filter(hero_id__in=hero_ids).values_list('hero_id', flat=True))
+            memberships = GuildMembership.objects.bulk_create([
+                GuildMembership(guild=self, hero_id=hero_id, role='member')
+                for hero_id in sorted(hero_ids - taken)
+            ])
+            self._change_members_count(len(memberships))
+        return memberships
+
+    def remove_members(self, heroes):
+        """Удаляет пачку героев из гильдии: одно удаление и одно обновление строки гильдии."""
+        with transaction.atomic():
+            _, deleted = GuildMembership.objects.filter(guild=self, hero__in=heroes).delete()
+            self._change_members_count(-deleted.get(GuildMembership._meta.label, 0))
+
+    def _change_members_count(self, delta):
+        """
+        Атомарно меняет счетчик участников (F('members_count') + delta) без
+        пересчета членств и без записи остальных полей гильдии.
+        Рейтинг по участникам сдвигается на delta после фиксации транзакции.
+        """
+        if not delta:
+            return
+        Guild.objects.filter(pk=self.pk).update(members_count=F('members_count') + delta, updated_at=timezone.now())
+        self.members_count += delta
+        from .leaderboards import GUILD_LEADERBOARDS
+        transaction.on_commit(lambda: GUILD_LEADERBOARDS['members'].increment(self.pk, delta))
 
 from django.utils.text import slugify # Импортируем здесь
 
@@ -104,20 +164,19 @@ class GuildMembership(models.Model):
         return f"{self.hero.name} в {self.guild.name} ({self.get_role_display()})"
 
     def contribute_experience(self, amount: int):
-        """Увеличивает вклад опыта участника и гильдии."""
-        self.experience_contributed += amount
-        self.guild.experience += amount
-        self.save()
-        self.guild.save()
-        # TODO: Проверка на уровень гильдии
+        """
+        Увеличивает вклад опыта участника и гильдии.
+        Вклад копится в Redis и попадает в БД (и в уровень гильдии)
+        при следующем переносе (guilds.contributions.fold_contributions).
+        """
+        from .contributions import buffer_contribution
+        buffer_contribution(self, experience=amount)
 
     def contribute_gold(self, amount: int):
-        """Увеличивает вклад золота участника и гильдии."""
-        self.gold_contributed += amount
-        self.guild.gold_donated += amount
+        """Увеличивает вклад золота участника и гильдии (через буфер, как опыт)."""
+        from .contributions import buffer_contribution
         # TODO: Списать золото у героя
-        self.save()
-        self.guild.save()
+        buffer_contribution(self, gold=amount)
 
 class GuildInvitation(models.Model):
     """
@@ -146,38 +205,80 @@ class GuildInvitation(models.Model):
         return f"Приглашение {self.invited_hero.name} в {self.guild.name} ({status})"
 
     def accept(self):
-        """Принимает приглашение."""
-        if not self.is_accepted and not self.is_declined:
-            self.is_accepted = True
-            self.is_declined = False
-            self.responded_at = timezone.now()
-            self.save()
-            
+        """
+        Принимает приглашение.
+        Статус меняется условным UPDATE - повторное или параллельное принятие
+        ничего не делает; членство и счетчик гильдии меняются в той же транзакции.
+        """
+        with transaction.atomic():
+            if not self._respond(is_accepted=True):
+                return
             # Добавляем героя в гильдию
             self.guild.add_member(self.invited_hero)
-            
-            # Отправляем уведомление пригласившему
-            from accounts.services import send_notification
-            send_notification(
-                self.invited_by,
-                title=f"{self.invited_hero.name} принял приглашение!",
-                message=f"Герой {self.invited_hero.name} присоединился к гильдии {self.guild.name} по вашему приглашению.",
-                notification_type='success'
-            )
+
+        # Отправляем уведомление пригласившему
+        from accounts.services import send_notification
+        send_notification(
+            self.invited_by,
+            title=f"{self.invited_hero.name} принял приглашение!",
+            message=f"Герой {self.invited_hero.name} присоединился к гильдии {self.guild.name} по вашему приглашению.",
+            notification_type='success'
+        )
 
     def decline(self):
         """Отклоняет приглашение."""
-        if not self.is_accepted and not self.is_declined:
-            self.is_declined = True
-            self.is_accepted = False
-            self.responded_at = timezone.now()
-            self.save()
-            
-            # Отправляем уведомление пригласившему
-            from accounts.services import send_notification
-            send_notification(
-                self.invited_by,
-                title=f"{self.invited_hero.name} отклонил приглашение",
-                message=f"Герой {self.invited_hero.name} отклонил приглашение в гильдию {self.guild.name}.",
-                notification_type='info'
-            )
+        if not self._respond(is_declined=True):
+            return
+
+        # Отправляем уведомление пригласившему
+        from accounts.services import send_notification
+        send_notification(
+            self.invited_by,
+            title=f"{self.invited_hero.name} отклонил приглашение",
+            message=f"Герой {self.invited_hero.name} отклонил приглашение в гильдию {self.guild.name}.",
+            notification_type='info'
+        )
+
+    def _respond(self, **status):
+        """Отмечает ответ на приглашение, если ответа еще не было. Возвращает True при успехе."""
+        responded_at = timezone.now()
+        updated = GuildInvitation.objects.filter(
+            pk=self.pk, is_accepted=False, is_declined=False,
+        ).update(responded_at=responded_at, **status)
+        if updated:
+            self.responded_at = responded_at
+            for field, value in status.items():
+                setattr(self, field, value)
+        return bool(updated)
+
+class GuildContributionFold(models.Model):
+    """
+    Примененная пачка отложенных вкладов (guilds.contributions).
+    Пишется в одной транзакции с самими вкладами - по ней повторный перенос
+    той же пачки узнает, что она уже учтена.
+    """
+    fold_id = models.CharField(max_length=32, unique=True, verbose_name="Пачка")
+    folded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Перенос вкладов"
+        verbose_name_plural = "Переносы вкладов"
+
+    def __str__(self):
+        return self.fold_id
+
+# Сигналы для поддержки рейтингов гильдий в Redis (guilds.leaderboards)
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=Guild)
+def update_guild_leaderboards(sender, instance, created=False, update_fields=None, **kwargs):
+    # Рейтинги зависят только от счетчиков; дальше их двигают атомарные изменения
+    if created or update_fields is None or set(update_fields) & set(GUILD_COUNTER_FIELDS):
+        from .leaderboards import update_guild
+        update_guild(instance)
+
+@receiver(post_delete, sender=Guild)
+def remove_guild_from_leaderboards(sender, instance, **kwargs):
+    from .leaderboards import remove_guild
+    remove_guild(instance.pk)
@@ -0,0 +1,49 @@
+# guilds/tasks.py (новый файл)
+"""
+Celery задачи гильдий.
+"""
+from celery import shared_task
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import Guild, GuildMembership
+from .leaderboards import rebuild_guild_leaderboards
+from .contributions import fold_contributions, prune_fold_records
+import logging
+
+logger = logging.getLogger(__name__)
+
+def recount_members():
+    """
+    Сверяет Guild.members_count с числом членств. Вступления и выходы меняют
+    счетчик на +-1 (Guild._change_members_count), здесь исправляются
+    расхождения после изменений в обход этих методов.
+    """
+    counts = GuildMembership.objects.filter(guild=OuterRef('pk')).order_by().values('guild').annotate(
+        total=Count('pk'),
+    ).values('total')
+    return Guild.objects.update(members_count=Coalesce(Subquery(counts), Value(0)))
+
+@shared_task
+def reconcile_guild_leaderboards():
+    """
+    Пересчитывает счетчики участников гильдий (одним UPDATE), сверяет
+    рейтинги гильдий в Redis с БД (полная пересборка) и чистит старые
+    записи о перенесенных вкладах.
+    Исправляет расхождения после массовых UPDATE и потери данных Redis.
+    """
+    recount_members()
+    prune_fold_records()
+    total = rebuild_guild_leaderboards()
+    logger.info(f"Рейтинги гильдий пересобраны: {total} гильдий.")
+    return f"Пересобрано {total} гильдий."
+
+@shared_task
+def fold_guild_contributions():
+    """
+    Переносит накопленные в Redis вклады участников в гильдии
+    и повышает уровни гильдий.
+    """
+    guilds, level_ups = fold_contributions()
+    if guilds:
+        logger.info(f"Вклады перенесены в {guilds} гильдий, повышений уровня: {level_ups}.")
+    return f"Обновлено {guilds} гильдий, повышений уровня: {level_ups}."
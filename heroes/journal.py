@@ -0,0 +1,43 @@
+# heroes/journal.py (новый файл)
+"""
+Журнал событий героя: список последних N записей в Redis на каждого героя.
+Запись идет пачками через pipeline (один обмен с Redis на пачку героев),
+чтение - одним LRANGE.
+"""
+from django.conf import settings
+from django_redis import get_redis_connection
+
+# Сколько последних записей хранится в журнале героя
+HERO_JOURNAL_LENGTH = getattr(settings, 'HERO_JOURNAL_LENGTH', 20)
+# Журнал неактивного героя удаляется через неделю
+HERO_JOURNAL_TIMEOUT = getattr(settings, 'HERO_JOURNAL_TIMEOUT', 7 * 24 * 3600)
+
+def _journal_key(hero_id):
+    return f"hero_journal:{hero_id}"
+
+def append_entries(entries):
+    """
+    Добавляет записи в журналы героев за один обмен с Redis.
+    entries - последовательность пар (id героя, текст) в хронологическом порядке.
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    hero_ids = set()
+    for hero_id, entry in entries:
+        pipe.lpush(_journal_key(hero_id), entry) # Новые записи в начале списка
+        hero_ids.add(hero_id)
+    for hero_id in hero_ids:
+        pipe.ltrim(_journal_key(hero_id), 0, HERO_JOURNAL_LENGTH - 1)
+        pipe.expire(_journal_key(hero_id), HERO_JOURNAL_TIMEOUT)
+    pipe.execute()
+
+def append_entry(hero_id, entry):
+    """Добавляет одну запись в журнал героя."""
+    append_entries([(hero_id, entry)])
+
+def read_journal(hero_id, limit=HERO_JOURNAL_LENGTH):
+    """Последние limit записей журнала героя, от новых к старым."""
+    entries = get_redis_connection("default").lrange(_journal_key(hero_id), 0, limit - 1)
+    return [entry.decode('utf-8') for entry in entries]
@@ -0,0 +1,84 @@
+# heroes/leaderboards.py (новый файл)
+"""
+Рейтинги героев в Redis: по уровню (затем опыту), убитым монстрам,
+выполненным квестам и смертям. Тик обновляет их пачкой после сброса
+изменений (game_engine.batch.TickBatch), раз в сутки они пересобираются
+из БД (heroes.tasks.rebuild_hero_leaderboards). Место героя, страница
+топа и соседи по рейтингу читаются из Redis, без ORDER BY/COUNT по Hero.
+"""
+from django_redis import get_redis_connection
+from divine_heroes.leaderboards import RedisLeaderboard, composite_score, rebuild_leaderboards
+
+HERO_LEADERBOARDS = {
+    'level': RedisLeaderboard('heroes:level'),                       # Уровень, затем опыт
+    'monsters_killed': RedisLeaderboard('heroes:monsters_killed'),   # Убито монстров
+    'quests_completed': RedisLeaderboard('heroes:quests_completed'), # Выполнено квестов
+    'deaths': RedisLeaderboard('heroes:deaths'),                     # Смертей
+}
+HERO_LEADERBOARD_TITLES = {
+    'level': "Уровень",
+    'monsters_killed': "Убито монстров",
+    'quests_completed': "Выполнено квестов",
+    'deaths': "Смерти",
+}
+# Поля героя, от которых зависят рейтинги
+HERO_LEADERBOARD_FIELDS = ('level', 'experience', 'monsters_killed', 'quests_completed', 'deaths')
+
+def hero_scores(level, experience, monsters_killed, quests_completed, deaths):
+    """Счета героя по каждому рейтингу."""
+    return {
+        'level': composite_score(level, experience),
+        'monsters_killed': monsters_killed,
+        'quests_completed': quests_completed,
+        'deaths': deaths,
+    }
+
+def update_heroes(heroes):
+    """Записывает текущие значения героев во все рейтинги за один обмен с Redis."""
+    scores = {board: {} for board in HERO_LEADERBOARDS}
+    for hero in heroes:
+        for board, score in hero_scores(*(getattr(hero, field) for field in HERO_LEADERBOARD_FIELDS)).items():
+            scores[board][hero.pk] = score
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for board, board_scores in scores.items():
+        HERO_LEADERBOARDS[board].set_scores(board_scores, pipe=pipe)
+    pipe.execute()
+
+def remove_hero(hero_id):
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for leaderboard in HERO_LEADERBOARDS.values():
+        leaderboard.remove(hero_id, pipe=pipe)
+    pipe.execute()
+
+def _with_heroes(rows):
+    """[(место, id, счет)] -> [(место, герой)] одним запросом к БД."""
+    from .models import Hero
+    heroes = Hero.objects.in_bulk([hero_id for _, hero_id, _ in rows])
+    return [(rank, heroes[hero_id]) for rank, hero_id, _ in rows if hero_id in heroes]
+
+def top_heroes(board='level', count=10, offset=0):
+    """Страница рейтинга: [(место, герой)]."""
+    return _with_heroes(HERO_LEADERBOARDS[board].top(count, offset))
+
+def hero_neighbours(hero_id, board='level', radius=10):
+    """Герой и до radius соседей выше и ниже него: [(место, герой)]."""
+    return _with_heroes(HERO_LEADERBOARDS[board].around(hero_id, radius))
+
+def hero_ranks(hero_id):
+    """Места героя во всех рейтингах {рейтинг: место или None} за один обмен с Redis."""
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for leaderboard in HERO_LEADERBOARDS.values():
+        pipe.zrevrank(leaderboard.key, hero_id)
+    return {
+        board: None if rank is None else rank + 1
+        for board, rank in zip(HERO_LEADERBOARDS, pipe.execute())
+    }
+
+def rebuild_hero_leaderboards():
+    """Пересобирает все рейтинги героев из БД за один проход. Возвращает число героев."""
+    from .models import Hero
+    rows = Hero.objects.values_list('pk', *HERO_LEADERBOARD_FIELDS)
+    return rebuild_leaderboards(HERO_LEADERBOARDS, (
+        (row[0], hero_scores(*row[1:]))
+        for row in rows.iterator(chunk_size=2000)
+    ))
@@ -1,6 +1,12 @@
 # heroes/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q, Case, When, Value
+from django.db.models.functions import Greatest, Least
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .realtime import capture, publish_change
+from .journal import append_entry
+from game_engine.core import random_action
 import random
 
 class Hero(models.Model):
@@ -39,6 +45,8 @@ class Hero(models.Model):
     
     # Время последнего обновления состояния героя (для ZPG engine)
     last_updated = models.DateTimeField(auto_now=True)
+    # Когда герой должен сделать следующий ход (None - не нужно, например, мертв)
+    next_action_at = models.DateTimeField(null=True, blank=True, default=timezone.now, db_index=True)
     
     # Статистика
     monsters_killed = models.PositiveIntegerField(default=0)
@@ -51,53 +59,89 @@ class Hero(models.Model):
     def __str__(self):
         return f"{self.name} (уровень {self.level})"
 
-    def get_random_action(self):
+    def get_random_action(self, rng=random):
         """
         Возвращает случайное действие героя (для демонстрации ZPG).
         В реальном движке это будет сложнее.
         """
-        actions = [
-            f"{self.name} идет по тропе в поисках приключений.",
-            f"{self.name} осматривает окрестности, оглядывая каждый куст.",
-            f"{self.name} находит немного золота!",
-            f"{self.name} сталкивается с монстром!",
-            f"{self.name} отдыхает у костра, восстанавливая силы.",
-            f"{self.name} слышит странный шепот из кустов...",
-            f"{self.name} натыкается на древний артефакт!",
-            f"{self.name} получает задание от таинственного незнакомца.",
-            f"{self.name} участвует в гильдейском турнире.",
-            f"{self.name} отправляется на рыбалку.",
-            f"{self.name} изучает старинную карту.",
-            f"{self.name} помогает крестьянину с урожаем.",
-        ]
-        return random.choice(actions)
+        return random_action(self.name, rng, self.level)
+
+    def update_atomically(self, condition=None, **changes):
+        """
+        Меняет поля героя одним условным UPDATE (значения - выражения F() и т.п.),
+        не перезаписывая остальную строку и без блокировок.
+        Мертвых героев не трогает; condition - дополнительное условие (Q).
+        Возвращает True, если строка обновилась; тогда поля экземпляра перечитываются,
+        а если менялись поля рейтингов - обновляются и рейтинги героя.
+        """
+        from .leaderboards import HERO_LEADERBOARD_FIELDS, update_heroes
+        from .snapshots import invalidate_snapshots
+        now = timezone.now()
+        queryset = Hero.objects.filter(pk=self.pk).exclude(state='dead')
+        if condition is not None:
+            queryset = queryset.filter(condition)
+        updated = queryset.update(last_updated=now, updated_at=now, **changes)
+        if updated:
+            ranked = any(field in HERO_LEADERBOARD_FIELDS for field in changes)
+            fields = set(changes) | {'level', 'state', 'last_updated', 'updated_at'}
+            if ranked:
+                fields.update(HERO_LEADERBOARD_FIELDS)
+            self.refresh_from_db(fields=list(fields))
+            # UPDATE не вызывает сигналы - снимок героя загрузится заново, рейтинги обновляем сами.
+            # Только после фиксации: иначе промах до нее снова закэширует старые значения
+            owner_id = self.owner_id
+            transaction.on_commit(lambda: invalidate_snapshots([owner_id]))
+            if ranked:
+                transaction.on_commit(lambda: update_heroes([self]))
+        return bool(updated)
+
+    def _record_action(self, result, before=None):
+        """
+        Записывает результат вмешательства в журнал героя и, если герой
+        изменился (передан снимок before), публикует дельту. Журнал пишется
+        первым: страница, получившая новую версию, уже увидит в нем запись.
+        """
+        append_entry(self.id, result)
+        if before is not None:
+            publish_change(self, before, result) # Новая версия героя и дельта для страницы
+        return result
 
     def apply_lightning_strike(self):
         """Логика удара молнии."""
         if self.state == 'dead':
-            return f"{self.name} уже мертв. Молния пролетает мимо."
+            return self._record_action(f"{self.name} уже мертв. Молния пролетает мимо.")
+        before = capture(self)
         # Пример: останавливает действие или наносит урон
         damage = 15 # Более сильный удар
-        self.health = max(0, self.health - damage) # Пример урона
-        self.save()
-        if self.health == 0:
-            self.state = 'dead'
-            self.deaths += 1
-            self.save()
-            return f"Молния сокрушила {self.name}! Герой погиб."
-        return f"Молния ударила {self.name}! Нанесено {damage} урона. Здоровье: {self.health}/{self.max_health}"
+        killed = Q(health__lte=damage)
+        if not self.update_atomically(
+            health=Greatest(F('health') - damage, Value(0), output_field=models.IntegerField()),
+            state=Case(When(killed, then=Value('dead')), default=F('state')),
+            deaths=Case(When(killed, then=F('deaths') + 1), default=F('deaths'), output_field=models.IntegerField()),
+        ):
+            # Герой погиб, пока молния летела (например, в бою во время тика)
+            return self._record_action(f"{self.name} уже мертв. Молния пролетает мимо.")
+        if self.state == 'dead':
+            result = f"Молния сокрушила {self.name}! Герой погиб."
+        else:
+            result = f"Молния ударила {self.name}! Нанесено {damage} урона. Здоровье: {self.health}/{self.max_health}"
+        return self._record_action(result, before)
 
     def apply_divine_speech(self, message):
         """Логика божественной реплики."""
         if self.state == 'dead':
-            return f"{self.name} мертв и не может услышать ваши слова."
+            return self._record_action(f"{self.name} мертв и не может услышать ваши слова.")
+        before = capture(self)
         # Пример: увеличивает опыт или здоровье
         exp_gain = 7
         heal_amount = 8
-        self.experience += exp_gain
-        self.health = min(self.max_health, self.health + heal_amount)
-        self.save()
-        return f"{self.name} услышал: '{message}'. Получено {exp_gain} опыта и {heal_amount} здоровья!"
+        if not self.update_atomically(
+            experience=F('experience') + exp_gain,
+            health=Least(F('health') + heal_amount, F('max_health'), output_field=models.IntegerField()),
+        ):
+            return self._record_action(f"{self.name} мертв и не может услышать ваши слова.")
+        result = f"{self.name} услышал: '{message}'. Получено {exp_gain} опыта и {heal_amount} здоровья!"
+        return self._record_action(result, before)
 
     @classmethod
     def create_for_user(cls, user):
@@ -108,3 +152,33 @@ class Hero(models.Model):
         return hero
 
 # Дополнительные модели для событий, инвентаря и т.д. будут добавлены позже.
+
+# Сигналы для поддержки кэша снимков (heroes.snapshots) и рейтингов (heroes.leaderboards) героев
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=Hero)
+def refresh_hero_snapshot(sender, instance, update_fields=None, **kwargs):
+    from .snapshots import store_snapshots, invalidate_snapshots
+    if update_fields or instance.get_deferred_fields():
+        # Экземпляр может быть неполным - пусть снимок загрузится заново
+        invalidate_snapshots([instance.owner_id])
+    else:
+        store_snapshots([instance])
+
+@receiver(post_save, sender=Hero)
+def add_hero_to_leaderboards(sender, instance, created=False, **kwargs):
+    # Дальше рейтинги обновляет тик
+    if created:
+        from .leaderboards import update_heroes
+        update_heroes([instance])
+
+@receiver(post_delete, sender=Hero)
+def drop_hero_snapshot(sender, instance, **kwargs):
+    from .snapshots import invalidate_snapshots
+    invalidate_snapshots([instance.owner_id])
+
+@receiver(post_delete, sender=Hero)
+def remove_hero_from_leaderboards(sender, instance, **kwargs):
+    from .leaderboards import remove_hero
+    remove_hero(instance.pk)
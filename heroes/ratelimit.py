@@ -0,0 +1,104 @@
+# heroes/ratelimit.py (новый файл)
+"""
+Ограничение частоты божественных вмешательств: "ведро жетонов" в Redis.
+Проверка - один вызов Lua-скрипта (атомарно, без запросов к БД):
+скрипт сам узнает, премиум ли игрок (множество premium_users в Redis,
+его поддерживает сигнал PlayerProfile), пополняет ведро по прошедшему
+времени и списывает жетон.
+"""
+import math
+from django.conf import settings
+from django_redis import get_redis_connection
+
+# Действие: {'default'/'premium': (емкость ведра, жетонов в минуту)}
+HERO_ACTION_RATE_LIMITS = getattr(settings, 'HERO_ACTION_RATE_LIMITS', {
+    'lightning': {'default': (3, 1), 'premium': (10, 5)},
+    'speech': {'default': (5, 2), 'premium': (20, 10)},
+})
+
+PREMIUM_USERS_KEY = "premium_users"
+
+# KEYS: ведро обычного игрока, ведро премиум игрока, множество премиум игроков
+# ARGV: id пользователя, емкость и пополнение (жетонов/мс) для обычных, то же для премиум
+# Возвращает {1, 0} если жетон списан, иначе {0, через сколько мс появится жетон}
+_TOKEN_BUCKET_SCRIPT = """
+local premium = redis.call('SISMEMBER', KEYS[3], ARGV[1]) == 1
+local key, capacity, rate = KEYS[1], tonumber(ARGV[2]), tonumber(ARGV[3])
+if premium then
+    key, capacity, rate = KEYS[2], tonumber(ARGV[4]), tonumber(ARGV[5])
+end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed, retry = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', key, math.ceil(capacity / rate))
+return {allowed, retry}
+"""
+
+_script = None
+
+def _token_bucket():
+    global _script
+    if _script is None:
+        _script = get_redis_connection("default").register_script(_TOKEN_BUCKET_SCRIPT)
+    return _script
+
+def _per_ms(per_minute):
+    return per_minute / 60000.0
+
+def consume(user_id, action):
+    """
+    Списывает жетон действия игрока.
+    Возвращает (разрешено, через сколько секунд повторить).
+    Действия без настроенного лимита не ограничиваются.
+    """
+    limits = HERO_ACTION_RATE_LIMITS.get(action)
+    if limits is None:
+        return True, 0
+    capacity, per_minute = limits['default']
+    premium_capacity, premium_per_minute = limits.get('premium', limits['default'])
+    allowed, retry_ms = _token_bucket()(
+        keys=[
+            f"ratelimit:{action}:{user_id}",
+            f"ratelimit:{action}:premium:{user_id}",
+            PREMIUM_USERS_KEY,
+        ],
+        args=[
+            user_id,
+            capacity, _per_ms(per_minute),
+            premium_capacity, _per_ms(premium_per_minute),
+        ],
+    )
+    return bool(allowed), math.ceil(int(retry_ms) / 1000)
+
+def set_premium(user_id, premium):
+    """Отмечает (или снимает) премиум статус игрока в Redis."""
+    connection = get_redis_connection("default")
+    if premium:
+        connection.sadd(PREMIUM_USERS_KEY, user_id)
+    else:
+        connection.srem(PREMIUM_USERS_KEY, user_id)
+
+def sync_premium_users():
+    """
+    Пересобирает множество премиум игроков из БД (например, после развертывания
+    или массового queryset.update, который не вызывает сигналы).
+    """
+    from accounts.models import PlayerProfile
+    user_ids = list(PlayerProfile.objects.filter(premium_status=True).values_list('user_id', flat=True))
+    pipe = get_redis_connection("default").pipeline()
+    pipe.delete(PREMIUM_USERS_KEY)
+    if user_ids:
+        pipe.sadd(PREMIUM_USERS_KEY, *user_ids)
+    pipe.execute()
+    return len(user_ids)
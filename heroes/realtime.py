@@ -0,0 +1,154 @@
+# heroes/realtime.py (новый файл)
+"""
+Рассылка изменений героя в реальном времени через Redis pub/sub.
+Тик и действия игрока публикуют только изменившиеся поля (дельту) в канал
+владельца героя; страница героя получает их через Server-Sent Events,
+а при недоступности SSE - длинным опросом с курсором версии.
+
+Версия героя - монотонно растущий счетчик в Redis (хеш hero_version:<id владельца>,
+поле v), увеличивается при каждой публикации. Если ключ потерян, счетчик
+начинается заново с текущего времени в миллисекундах, поэтому версии не повторяются.
+В поле due хранится время следующего хода героя (для ленивого режима).
+"""
+import json
+import time
+from django.conf import settings
+from django_redis import get_redis_connection
+
+# Поля героя, которые видит страница героя
+HERO_PUSH_FIELDS = (
+    'name', 'level', 'health', 'max_health', 'gold', 'experience',
+    'state', 'location', 'monsters_killed', 'deaths',
+)
+# Сколько секунд длинный опрос ждет изменений
+HERO_LONG_POLL_TIMEOUT = getattr(settings, 'HERO_LONG_POLL_TIMEOUT', 25)
+# Как часто SSE-поток шлет комментарий, чтобы прокси не закрывали соединение
+HERO_STREAM_KEEPALIVE = getattr(settings, 'HERO_STREAM_KEEPALIVE', 15)
+# Сколько секунд живет один SSE-поток. Django 4.2 не замечает отключение клиента
+# посреди потока, поэтому поток закрывается сам, а EventSource переподключается
+HERO_STREAM_LIFETIME = getattr(settings, 'HERO_STREAM_LIFETIME', 300)
+
+def hero_channel(owner_id):
+    """Канал обновлений героя (по id владельца - его знает любой запрос без БД)."""
+    return f"hero_updates:{owner_id}"
+
+def _version_key(owner_id):
+    return f"hero_version:{owner_id}"
+
+def _due_value(hero):
+    return hero.next_action_at.timestamp() if hero.next_action_at else ''
+
+def capture(hero):
+    """Снимок видимых полей героя, как их отдает hero_detail_data."""
+    snapshot = {field: getattr(hero, field) for field in HERO_PUSH_FIELDS}
+    snapshot['state'] = hero.get_state_display()
+    return snapshot
+
+def publish_changes(changes):
+    """
+    Публикует дельты героев. changes - последовательность
+    (герой, снимок до изменений, запись журнала или None).
+    Два обмена с Redis на всю пачку: версии, затем публикация.
+    """
+    connection = get_redis_connection("default")
+    pipe = connection.pipeline(transaction=False)
+    now_ms = int(time.time() * 1000)
+    deltas = []
+    command_count = 0
+    for hero, before, log_entry in changes:
+        key = _version_key(hero.owner_id)
+        pipe.hset(key, 'due', _due_value(hero))
+        command_count += 1
+        delta = {field: value for field, value in capture(hero).items() if before.get(field) != value}
+        if log_entry:
+            delta['last_action'] = log_entry
+        if delta:
+            pipe.hsetnx(key, 'v', now_ms) # Начальное значение, если счетчика нет
+            pipe.hincrby(key, 'v', 1)
+            command_count += 2
+            deltas.append((hero.owner_id, delta, command_count - 1)) # Индекс результата HINCRBY
+    if not command_count:
+        return
+    results = pipe.execute()
+    if not deltas:
+        return
+
+    pipe = connection.pipeline(transaction=False)
+    for owner_id, delta, result_index in deltas:
+        version = results[result_index]
+        message = json.dumps({'version': version, 'delta': delta}, ensure_ascii=False)
+        pipe.publish(hero_channel(owner_id), message)
+    pipe.execute()
+
+def publish_change(hero, before, log_entry=None):
+    """Публикует дельту одного героя."""
+    publish_changes([(hero, before, log_entry)])
+
+def current_version(owner_id):
+    """Текущая версия героя (0, если изменений еще не было)."""
+    return int(get_redis_connection("default").hget(_version_key(owner_id), 'v') or 0)
+
+def version_state(owner_id):
+    """
+    Версия героя и время его следующего хода (timestamp или None) одним HMGET.
+    """
+    version, due = get_redis_connection("default").hmget(_version_key(owner_id), 'v', 'due')
+    return int(version or 0), (float(due) if due else None)
+
+def wait_for_update(owner_id, since, timeout=HERO_LONG_POLL_TIMEOUT):
+    """
+    Длинный опрос: ждет, пока версия героя станет больше since.
+    Возвращает новую версию или None по истечении timeout.
+    """
+    version = current_version(owner_id)
+    if version > since:
+        return version
+    pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(hero_channel(owner_id))
+    try:
+        # Изменение могло прийти между проверкой версии и подпиской
+        version = current_version(owner_id)
+        if version > since:
+            return version
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            message = pubsub.get_message(timeout=remaining)
+            if message is not None:
+                return json.loads(message['data'])['version']
+    finally:
+        pubsub.close()
+
+async def event_stream(owner_id):
+    """
+    Асинхронный поток Server-Sent Events с дельтами героя.
+    Работает только через ASGI (divine_heroes/asgi.py) и завершается
+    через HERO_STREAM_LIFETIME секунд.
+    """
+    import redis.asyncio as aioredis # Нужен только ASGI-воркерам
+
+    client = aioredis.from_url(settings.CACHES['default']['LOCATION'])
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(hero_channel(owner_id))
+        yield "retry: 5000\n\n"
+        deadline = time.monotonic() + HERO_STREAM_LIFETIME
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            message = await pubsub.get_message(timeout=min(HERO_STREAM_KEEPALIVE, remaining))
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            data = message['data'].decode('utf-8')
+            version = json.loads(data)['version']
+            yield f"id: {version}\ndata: {data}\n\n"
+    finally:
+        try:
+            await pubsub.unsubscribe(hero_channel(owner_id))
+        finally:
+            await pubsub.close()
+            await client.close()
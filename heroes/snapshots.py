@@ -0,0 +1,126 @@
+# heroes/snapshots.py (новый файл)
+"""
+Кэш "снимков" героев для страниц, которые только читают героя.
+Снимок - кортеж значений полей модели в Redis по id владельца.
+Заполняется при промахе (с короткой блокировкой от одновременной загрузки)
+только если снимка еще нет, перезаписывается при Hero.save и при пакетной
+записи тика.
+Для изменения героя снимок не использовать - загружать героя из БД.
+Массовые UPDATE (мировые события) не перебирают героев, а меняют эпоху
+снимков: снимки прошлой эпохи считаются промахом. Процессы сверяют эпоху
+с кэшем не чаще раза в HERO_SNAPSHOT_EPOCH_CHECK_SECONDS.
+"""
+import time
+import zlib
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from .models import Hero
+
+HERO_SNAPSHOT_TIMEOUT = getattr(settings, 'HERO_SNAPSHOT_TIMEOUT', 3600)
+# Блокировка загрузки снимка из БД (секунды) и ожидание чужой загрузки
+HERO_SNAPSHOT_LOCK_TIMEOUT = 5
+HERO_SNAPSHOT_WAIT_ATTEMPTS = 5
+HERO_SNAPSHOT_WAIT_SECONDS = 0.05
+HERO_SNAPSHOT_EPOCH_KEY = "hero_snapshot_epoch"
+HERO_SNAPSHOT_EPOCH_CHECK_SECONDS = getattr(settings, 'HERO_SNAPSHOT_EPOCH_CHECK_SECONDS', 5)
+
+_FIELD_NAMES = [field.attname for field in Hero._meta.concrete_fields]
+# Меняется вместе с набором полей, чтобы не читать снимки старой схемы после миграции
+# (снимок - (эпоха, значения полей))
+_SCHEMA = zlib.crc32(','.join(['epoch'] + _FIELD_NAMES).encode())
+# Эпоха, известная процессу, и когда её сверять с кэшем
+_epoch = {'value': 0, 'checked_at': 0.0}
+
+def snapshot_epoch():
+    """Текущая эпоха снимков (из памяти процесса, сверяется с кэшем периодически)."""
+    now = time.monotonic()
+    if now - _epoch['checked_at'] >= HERO_SNAPSHOT_EPOCH_CHECK_SECONDS:
+        _epoch['value'] = cache.get(HERO_SNAPSHOT_EPOCH_KEY, 0)
+        _epoch['checked_at'] = now
+    return _epoch['value']
+
+def bump_snapshot_epoch():
+    """Делает устаревшими снимки всех героев (после UPDATE в обход модели)."""
+    try:
+        cache.incr(HERO_SNAPSHOT_EPOCH_KEY)
+    except ValueError:
+        cache.set(HERO_SNAPSHOT_EPOCH_KEY, 1, timeout=None)
+    _epoch['checked_at'] = 0.0
+
+def _snapshot_key(owner_id):
+    return f"hero_snapshot:{_SCHEMA}:{owner_id}"
+
+def _lock_key(owner_id):
+    return f"hero_snapshot_lock:{owner_id}"
+
+def _from_snapshot(snapshot):
+    """Герой из снимка или None, если снимка нет или он прошлой эпохи."""
+    if snapshot is None:
+        return None
+    epoch, values = snapshot
+    if epoch != snapshot_epoch():
+        return None
+    return Hero.from_db('default', _FIELD_NAMES, values)
+
+def _snapshot(hero, epoch):
+    return (epoch, tuple(getattr(hero, name) for name in _FIELD_NAMES))
+
+def store_snapshots(heroes):
+    """Перезаписывает снимки героев одним обращением к кэшу."""
+    epoch = snapshot_epoch()
+    snapshots = {_snapshot_key(hero.owner_id): _snapshot(hero, epoch) for hero in heroes}
+    if snapshots:
+        cache.set_many(snapshots, timeout=HERO_SNAPSHOT_TIMEOUT)
+
+def _fill_snapshot(hero):
+    """
+    Сохраняет снимок героя, загруженного при промахе. Пока строка читалась,
+    сохранение или тик могли записать более свежий снимок - его не трогаем,
+    заменяем только снимок прошлой эпохи.
+    """
+    key = _snapshot_key(hero.owner_id)
+    epoch = snapshot_epoch()
+    snapshot = _snapshot(hero, epoch)
+    if cache.add(key, snapshot, timeout=HERO_SNAPSHOT_TIMEOUT):
+        return
+    current = cache.get(key)
+    if current is None or current[0] != epoch:
+        cache.set(key, snapshot, timeout=HERO_SNAPSHOT_TIMEOUT)
+
+def invalidate_snapshots(owner_ids):
+    """Удаляет снимки героев (например, после UPDATE в обход модели)."""
+    keys = [_snapshot_key(owner_id) for owner_id in owner_ids]
+    if keys:
+        cache.delete_many(keys)
+
+def get_hero(owner_id):
+    """
+    Герой владельца из снимка или из БД при промахе. None, если героя нет.
+    """
+    hero = _from_snapshot(cache.get(_snapshot_key(owner_id)))
+    if hero is not None:
+        return hero
+
+    if cache.add(_lock_key(owner_id), 1, timeout=HERO_SNAPSHOT_LOCK_TIMEOUT):
+        try:
+            hero = Hero.objects.filter(owner_id=owner_id).first()
+            if hero is not None:
+                _fill_snapshot(hero)
+            return hero
+        finally:
+            cache.delete(_lock_key(owner_id))
+
+    # Снимок уже загружает другой запрос - немного подождем его
+    for _ in range(HERO_SNAPSHOT_WAIT_ATTEMPTS):
+        time.sleep(HERO_SNAPSHOT_WAIT_SECONDS)
+        hero = _from_snapshot(cache.get(_snapshot_key(owner_id)))
+        if hero is not None:
+            return hero
+    return Hero.objects.filter(owner_id=owner_id).first()
+
+def get_hero_or_404(owner_id):
+    hero = get_hero(owner_id)
+    if hero is None:
+        raise Http404("Герой не найден")
+    return hero
@@ -0,0 +1,30 @@
+# heroes/tasks.py (новый файл)
+"""
+Celery задачи героев.
+"""
+from celery import shared_task
+from .leaderboards import rebuild_hero_leaderboards
+from .ratelimit import sync_premium_users
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def reconcile_hero_leaderboards():
+    """
+    Сверяет рейтинги героев в Redis с БД (полная пересборка).
+    Исправляет расхождения после массовых UPDATE и потери данных Redis.
+    """
+    total = rebuild_hero_leaderboards()
+    logger.info(f"Рейтинги героев пересобраны: {total} героев.")
+    return f"Пересобрано {total} героев."
+
+@shared_task
+def reconcile_premium_users():
+    """
+    Пересобирает множество премиум игроков в Redis (heroes.ratelimit) из БД.
+    Исправляет расхождения после массовых UPDATE профилей и потери данных Redis.
+    """
+    total = sync_premium_users()
+    logger.info(f"Множество премиум игроков пересобрано: {total} игроков.")
+    return f"Премиум игроков: {total}."
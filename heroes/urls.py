@@ -6,5 +6,9 @@ app_name = 'heroes'
 urlpatterns = [
     path('', views.hero_detail, name='detail'), # Главная страница модуля
     path('detail/data/', views.hero_detail_data, name='detail_data'), # Для AJAX
+    path('detail/stream/', views.hero_stream, name='stream'), # Server-Sent Events
+    path('detail/updates/', views.hero_updates, name='updates'), # Длинный опрос
     path('action/<str:action_type>/', views.hero_action, name='action'),
+    path('leaderboard/', views.leaderboard, name='leaderboard'), # Рейтинг по уровню
+    path('leaderboard/<str:board>/', views.leaderboard, name='leaderboard_board'),
 ]
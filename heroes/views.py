@@ -1,23 +1,64 @@
 # heroes/views.py
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse, Http404
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from .models import Hero
+from .journal import append_entries, read_journal
+from .snapshots import get_hero_or_404, snapshot_epoch
+from .ratelimit import consume
+from .leaderboards import HERO_LEADERBOARDS, HERO_LEADERBOARD_TITLES, top_heroes, hero_neighbours
+from .realtime import capture, publish_change, current_version, version_state, wait_for_update, event_stream
 from game_engine.engine import engine
-from django.core.cache import cache
+from game_engine.scheduler import HERO_LAZY_SIMULATION
+
+def _catch_up(hero):
+    """
+    В ленивом режиме догоняет пропущенные ходы героя перед показом.
+    Возвращает True, если герой изменился.
+    """
+    if HERO_LAZY_SIMULATION and hero.next_action_at and hero.next_action_at <= timezone.now():
+        # Догоняем по свежим данным из БД, а не по снимку из кэша
+        hero.refresh_from_db()
+        before = capture(hero)
+        logs = engine.catch_up(hero)
+        if logs:
+            append_entries((hero.id, log_entry) for log_entry in logs)
+            publish_change(hero, before, logs[-1])
+            return True
+    return False
+
+def _etag(version):
+    # Эпоха снимков меняется после мировых событий, которые меняют всех героев сразу
+    return f'"{version}.{snapshot_epoch()}"' if version else None
+
+def _hero_data(hero):
+    """Данные героя для JSON-ответов."""
+    journal = read_journal(hero.id)
+    data = capture(hero)
+    data['last_action'] = journal[0] if journal else "Герой готов к приключениям!"
+    data['journal'] = journal
+    return data
 
 @login_required
 def hero_detail(request):
     """
     Отображает страницу героя текущего пользователя.
     """
-    hero = get_object_or_404(Hero, owner=request.user)
-    # Получаем последний лог из кэша (или из БД)
-    last_action = cache.get(f"hero_log_{hero.id}", "Герой готов к приключениям!")
+    hero = get_hero_or_404(request.user.id)
+    _catch_up(hero)
+    # Журнал последних событий героя (одно чтение из Redis)
+    journal = read_journal(hero.id)
+    last_action = journal[0] if journal else "Герой готов к приключениям!"
     
     context = {
         'hero': hero,
         'last_action': last_action,
+        'journal': journal,
+        'version': current_version(request.user.id), # Курсор для обновлений
     }
     return render(request, 'heroes/detail.html', context)
 
@@ -25,43 +66,120 @@ def hero_detail(request):
 def hero_detail_data(request):
     """
     Возвращает данные героя в формате JSON для AJAX обновления.
+    Поддерживает If-None-Match: если версия героя не изменилась,
+    отвечает 304 после одного чтения из Redis, без запроса к БД.
     """
-    hero = get_object_or_404(Hero, owner=request.user)
-    last_action = cache.get(f"hero_log_{hero.id}", "Герой готов к приключениям!")
-    
-    data = {
-        'name': hero.name,
-        'level': hero.level,
-        'health': hero.health,
-        'max_health': hero.max_health,
-        'gold': hero.gold,
-        'experience': hero.experience,
-        'state': hero.get_state_display(),
-        'location': hero.location,
-        'monsters_killed': hero.monsters_killed,
-        'deaths': hero.deaths,
-        'last_action': last_action,
-    }
-    return JsonResponse(data)
+    version, due_at = version_state(request.user.id)
+    etag = _etag(version)
+    # В ленивом режиме героя, чей ход уже наступил, нужно сначала догнать
+    may_be_due = HERO_LAZY_SIMULATION and (due_at is None or due_at <= timezone.now().timestamp())
+    if etag and not may_be_due and request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    hero = get_hero_or_404(request.user.id)
+    if _catch_up(hero):
+        etag = _etag(current_version(request.user.id))
+    response = JsonResponse(_hero_data(hero))
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache' # Браузер всегда переспрашивает с ETag
+    return response
+
+async def hero_stream(request):
+    """
+    Поток обновлений героя (Server-Sent Events): присылает только
+    изменившиеся поля, когда тик или действие игрока меняют героя.
+    Только под ASGI: под WSGI бесконечный поток собирался бы в список
+    и занимал поток сервера, ничего не отдав, поэтому отвечаем 503 -
+    страница сразу переходит на длинный опрос (hero_updates).
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=503)
+    user_id = await sync_to_async(
+        lambda: request.user.id if request.user.is_authenticated else None
+    )()
+    if user_id is None:
+        return HttpResponse(status=401)
+    response = StreamingHttpResponse(event_stream(user_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Не буферизовать поток в nginx
+    return response
 
 @login_required
+def hero_updates(request):
+    """
+    Длинный опрос (запасной вариант для SSE): ждет, пока версия героя
+    станет больше ?since=, и возвращает свежие данные героя.
+    """
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return JsonResponse({'error': 'Некорректная версия'}, status=400)
+    version = wait_for_update(request.user.id, since)
+    if version is None:
+        return JsonResponse({'version': since, 'changed': False})
+    hero = get_hero_or_404(request.user.id)
+    return JsonResponse({'version': version, 'changed': True, 'hero': _hero_data(hero)})
+
+@login_required
+@require_POST
 def hero_action(request, action_type):
     """
     Обрабатывает действия игрока (молния, реплика).
+    Частота действий ограничена (см. heroes.ratelimit): при превышении - 429.
     """
+    if action_type not in ('lightning', 'speech'):
+        return JsonResponse({'error': 'Неизвестное действие'}, status=400)
+    allowed, retry_after = consume(request.user.id, action_type)
+    if not allowed:
+        response = JsonResponse(
+            {'error': f'Слишком частые вмешательства. Попробуйте через {retry_after} с.'},
+            status=429,
+        )
+        response['Retry-After'] = str(retry_after)
+        return response
+
     hero = get_object_or_404(Hero, owner=request.user)
     result = ""
     
     if action_type == 'lightning':
         result = hero.apply_lightning_strike()
-    elif action_type == 'speech':
-        # В реальном приложении текст реплики должен передаваться в запросе
-        message = request.GET.get('message', 'Будь храбр!')
-        result = hero.apply_divine_speech(message)
     else:
-        return JsonResponse({'error': 'Неизвестное действие'}, status=400)
-        
-    # Обновляем кэш с последним действием
-    cache.set(f"hero_log_{hero.id}", result, timeout=3600)
-    
+        # Текст реплики - в теле POST, чтобы он не попадал в адрес и журналы доступа
+        message = request.POST.get('message') or 'Будь храбр!'
+        result = hero.apply_divine_speech(message)
+    # Запись в журнал и рассылку изменений делает сама модель
+
     return JsonResponse({'message': result})
+
+# Героев на странице рейтинга
+LEADERBOARD_PAGE_SIZE = 50
+
+def leaderboard(request, board='level'):
+    """
+    Страница рейтинга героев и соседи героя текущего пользователя.
+    Места читаются из Redis (heroes.leaderboards), из БД - только герои страницы.
+    """
+    if board not in HERO_LEADERBOARDS:
+        raise Http404("Неизвестный рейтинг")
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    neighbours = []
+    if request.user.is_authenticated:
+        hero_id = Hero.objects.filter(owner=request.user).values_list('pk', flat=True).first()
+        if hero_id is not None:
+            neighbours = hero_neighbours(hero_id, board)
+    context = {
+        'board': board,
+        'board_title': HERO_LEADERBOARD_TITLES[board],
+        'boards': HERO_LEADERBOARD_TITLES.items(),
+        'page': page,
+        'rows': top_heroes(board, LEADERBOARD_PAGE_SIZE, (page - 1) * LEADERBOARD_PAGE_SIZE),
+        'has_next': HERO_LEADERBOARDS[board].count() > page * LEADERBOARD_PAGE_SIZE,
+        'neighbours': neighbours,
+    }
+    return render(request, 'heroes/leaderboard.html', context)